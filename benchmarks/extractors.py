@@ -0,0 +1,53 @@
+"""
+Сравнение бэкендов LastUpdateExtractor на сохраненных страницах из tests/fixtures.
+
+Для каждой страницы и бэкенда печатает медианное время разбора и пиковую
+память по tracemalloc.
+
+    python benchmarks/extractors.py [page.html ...]
+"""
+import statistics
+import sys
+import time
+import tracemalloc
+from importlib.util import find_spec
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from tasks.scrapping_task.extractors import SoupExtractor, StreamingExtractor  # noqa: E402
+
+BACKENDS = {
+    'stream': StreamingExtractor(),
+    'soup': SoupExtractor(),
+}
+if find_spec('lxml'):
+    BACKENDS['lxml'] = SoupExtractor(features='lxml')
+
+
+def measure(extractor, content: str, runs: int = 20) -> tuple[float, int, int]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        items = extractor.extract(content)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    extractor.extract(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak, len(items)
+
+
+def main(pages: list[Path]):
+    for page in pages:
+        content = page.read_text(encoding='utf-8')
+        print(f'{page.name} ({len(content.encode()) // 1024} KiB):')
+        for name, extractor in BACKENDS.items():
+            elapsed, peak, count = measure(extractor, content)
+            print(f'  {name:<7} {elapsed * 1000:7.1f}ms  пик памяти {peak / 1024:8.0f} KiB  элементов {count}')
+
+
+if __name__ == '__main__':
+    main([Path(arg) for arg in sys.argv[1:]] or sorted((ROOT / 'tests' / 'fixtures').glob('*.html')))
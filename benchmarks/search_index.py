@@ -0,0 +1,104 @@
+"""
+Бенчмарк SeasonSearchIndex на синтетическом каталоге.
+
+Для каждого размера каталога печатает время сборки индекса, самую долгую
+паузу event loop во время refresh() и задержку поиска без кэша результатов.
+
+    python benchmarks/search_index.py [10000 100000]
+"""
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from repository.search import SeasonSearchIndex  # noqa: E402
+
+RU_WORDS = [
+    'магическая', 'битва', 'поднятие', 'уровня', 'одиночку', 'клинок', 'рассекающий', 'демонов',
+    'атака', 'титанов', 'моя', 'геройская', 'академия', 'семья', 'шпиона', 'человек', 'бензопила',
+    'провожающая', 'последний', 'путь', 'фрирен', 'волейбол', 'доктор', 'стоун', 'ван', 'пис',
+]
+EN_WORDS = [
+    'jujutsu', 'kaisen', 'solo', 'leveling', 'demon', 'slayer', 'attack', 'titan', 'hero',
+    'academia', 'spy', 'family', 'chainsaw', 'man', 'frieren', 'beyond', 'journey', 'end',
+    'haikyuu', 'doctor', 'stone', 'one', 'piece', 'season', 'part', 'final',
+]
+
+
+def synthetic_seasons(count: int, rnd: random.Random) -> list[tuple[int, str, str]]:
+    return [
+        (
+            season_id,
+            ' '.join(rnd.choices(RU_WORDS, k=rnd.randint(2, 5))) + f' {season_id}',
+            ' '.join(rnd.choices(EN_WORDS, k=rnd.randint(2, 5))) + f' {season_id}',
+        )
+        for season_id in range(1, count + 1)
+    ]
+
+
+def typo(title: str, rnd: random.Random) -> str:
+    words = title.split()[:3]
+    word = rnd.choice(words)
+    if len(word) > 3:
+        position = rnd.randrange(len(word))
+        words[words.index(word)] = word[:position] + word[position + 1:]
+    return ' '.join(words)
+
+
+async def max_loop_stall(index: SeasonSearchIndex, seasons: list) -> float:
+    async def load():
+        return seasons
+
+    stall = 0.0
+    done = asyncio.Event()
+
+    async def probe():
+        nonlocal stall
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - before - 0.001)
+
+    task = asyncio.create_task(probe())
+    index.invalidate()
+    await index.refresh(load)
+    done.set()
+    await task
+    return stall
+
+
+def run(count: int, queries: int = 300):
+    rnd = random.Random(count)
+    seasons = synthetic_seasons(count, rnd)
+    index = SeasonSearchIndex(cache_size=0)
+
+    started = time.perf_counter()
+    index.build(seasons)
+    build = time.perf_counter() - started
+
+    stall = asyncio.run(max_loop_stall(index, seasons))
+
+    latencies = []
+    for _ in range(queries):
+        _, title_ru, title_en = rnd.choice(seasons)
+        query = typo(rnd.choice([title_ru, title_en]), rnd)
+        started = time.perf_counter()
+        index.search(query)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    print(
+        f'{count:>7} сезонов: сборка {build * 1000:.0f}ms, '
+        f'пауза loop при refresh {stall * 1000:.1f}ms, '
+        f'поиск p50 {statistics.median(latencies) * 1000:.1f}ms, '
+        f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms'
+    )
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]:
+        run(size)
@@ -1,12 +1,12 @@
 #!/bin/bash
 
-# Do not autogenerate revision by default
-AUTOGENERATE=false
+# Schema created by the old autogenerated revisions is marked as the initial revision
+STAMP=false
 
 while [[ $# -gt 0 ]]; do
     case "$1" in
-        --auto)
-            AUTOGENERATE=true
+        --stamp)
+            STAMP=true
             shift
             ;;
         *)
@@ -16,9 +16,9 @@ while [[ $# -gt 0 ]]; do
     esac
 done
 
-if ! alembic check && $AUTOGENERATE; then
-    alembic revision --autogenerate
-    alembic upgrade head
+if $STAMP; then
+    alembic stamp --purge 0001_initial
 fi
 
-python ./src/main.py
\ No newline at end of file
+alembic upgrade head || exit 1
+python ./src/main.py
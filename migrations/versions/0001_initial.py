@@ -0,0 +1,98 @@
+"""initial
+
+Revision ID: 0001_initial
+Revises: 
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_initial'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('origins',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('title_ru', sa.String(), nullable=False),
+    sa.Column('title_en', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('title_ru', 'title_en')
+    )
+    op.create_table('users',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('joined_date', sa.Date(), nullable=False),
+    sa.Column('is_admin', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('voiceover_studios',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('seasons',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('origin_id', sa.Integer(), nullable=False),
+    sa.Column('title_ru', sa.String(), nullable=False),
+    sa.Column('title_en', sa.String(), nullable=False),
+    sa.Column('status', sa.Enum('RELEASED', 'ONGOING', 'ANNOUNCED', name='seasonstatus'), nullable=True),
+    sa.Column('cover', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['origin_id'], ['origins.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('seasons_with_studio',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('season_id', sa.Integer(), nullable=False),
+    sa.Column('studio_name', sa.String(), nullable=False),
+    sa.Column('season_name', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['season_id'], ['seasons.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['studio_name'], ['voiceover_studios.name'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('season_id', 'studio_name')
+    )
+    op.create_table('episodes',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('episode_number', sa.Integer(), nullable=False),
+    sa.Column('season_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['season_id'], ['seasons_with_studio.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('season_id', 'episode_number')
+    )
+    op.create_table('season_studio_secondary',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('season_id', sa.Integer(), nullable=False),
+    sa.Column('studio_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['season_id'], ['seasons_with_studio.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['studio_id'], ['voiceover_studios.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('user_season_secondary',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('season_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['season_id'], ['seasons_with_studio.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'season_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_season_secondary')
+    op.drop_table('season_studio_secondary')
+    op.drop_table('episodes')
+    op.drop_table('seasons_with_studio')
+    op.drop_table('seasons')
+    sa.Enum(name='seasonstatus').drop(op.get_bind(), checkfirst=True)
+    op.drop_table('voiceover_studios')
+    op.drop_table('users')
+    op.drop_table('origins')
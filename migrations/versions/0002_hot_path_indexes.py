@@ -0,0 +1,33 @@
+"""hot path indexes
+
+Revision ID: 0002_hot_path_indexes
+Revises: 0001_initial
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_hot_path_indexes'
+down_revision: Union[str, None] = '0001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # seasons are looked up by title_ru, 0008 replaces this index with a unique constraint
+    op.create_index(op.f('ix_seasons_title_ru'), 'seasons', ['title_ru'], unique=False)
+    op.create_index(op.f('ix_seasons_with_studio_season_name'), 'seasons_with_studio', ['season_name'], unique=False)
+    op.create_index(op.f('ix_user_season_secondary_season_id'), 'user_season_secondary', ['season_id'], unique=False)
+    op.create_index('ix_users_admins', 'users', ['id'], unique=False, postgresql_where=sa.text('is_admin'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_admins', table_name='users', postgresql_where=sa.text('is_admin'))
+    op.drop_index(op.f('ix_user_season_secondary_season_id'), table_name='user_season_secondary')
+    op.drop_index(op.f('ix_seasons_with_studio_season_name'), table_name='seasons_with_studio')
+    op.drop_index(op.f('ix_seasons_title_ru'), table_name='seasons')
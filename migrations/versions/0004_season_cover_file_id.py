@@ -0,0 +1,26 @@
+"""season cover file_id
+
+Revision ID: 0004_season_cover_file_id
+Revises: 0003_fsm_states
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_season_cover_file_id'
+down_revision: Union[str, None] = '0003_fsm_states'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('seasons', sa.Column('cover_file_id', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('seasons', 'cover_file_id')
@@ -0,0 +1,30 @@
+"""users is_active
+
+Revision ID: 0006_users_is_active
+Revises: 0005_announcements
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006_users_is_active'
+down_revision: Union[str, None] = '0005_announcements'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('is_active', sa.Boolean(), server_default=sa.true(), nullable=False))
+    op.add_column('users', sa.Column('deactivated_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_users_active', 'users', ['id'], unique=False, postgresql_where=sa.text('is_active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_active', table_name='users', postgresql_where=sa.text('is_active'))
+    op.drop_column('users', 'deactivated_at')
+    op.drop_column('users', 'is_active')
@@ -0,0 +1,53 @@
+"""episodes created_at, unique season title
+
+Revision ID: 0008_catalog_constraints
+Revises: 0007_notification_queue
+Create Date: 2026-10-18 17:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008_catalog_constraints'
+down_revision: Union[str, None] = '0007_notification_queue'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # release time of already saved episodes is unknown, they are dated far in the past
+    # so the scrapper schedule doesn't take the migration hour for a release hour
+    op.add_column('episodes', sa.Column(
+        'created_at', sa.DateTime(), server_default=sa.text("'1970-01-01'"), nullable=False,
+    ))
+    op.alter_column('episodes', 'created_at', server_default=sa.text('now()'))
+
+    # bulk import upserts seasons by title_ru
+    _check_duplicate_titles()
+    op.create_unique_constraint('seasons_title_ru_key', 'seasons', ['title_ru'])
+    op.drop_index(op.f('ix_seasons_title_ru'), table_name='seasons')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_seasons_title_ru'), 'seasons', ['title_ru'], unique=False)
+    op.drop_constraint('seasons_title_ru_key', 'seasons', type_='unique')
+    op.drop_column('episodes', 'created_at')
+
+
+def _check_duplicate_titles():
+    """
+    Сезоны с одинаковым title_ru нельзя объединить автоматически: у каждого свои
+    озвучки, эпизоды и подписки. Их нужно переименовать или слить вручную.
+    """
+    if context.is_offline_mode():
+        return
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT title_ru, array_agg(id ORDER BY id) FROM seasons GROUP BY title_ru HAVING count(*) > 1'
+    )).all()
+    if duplicates:
+        listed = '; '.join(f'{title} (id {", ".join(map(str, ids))})' for title, ids in duplicates)
+        raise RuntimeError(f'Названия сезонов должны быть уникальны, исправьте дубликаты: {listed}')
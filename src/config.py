@@ -1,20 +1,112 @@
 from os import getenv
+from pathlib import Path
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
 from dependency_injector import containers, providers
 from dotenv import load_dotenv
 
-from repository.config import get_session_di
-from repository.repository import AdminRepository, AnimeRepository, UsersRepository
+from repository.config import current_session
+from repository.fsm_storage import PostgresStorage
+from repository.repository import AdminRepository, CachedAnimeRepository, UsersRepository
+from tasks.notification_task.announcements import AnnouncementSender
+from tasks.notification_task.broadcaster import Broadcaster, Priority
+from tasks.notification_task.digest import DigestAggregator
+from tasks.notification_task.job_queue import NotificationQueue
+from tasks.notification_task.recipients import deactivate_unreachable
+from tasks.scrapping_task.extractors import SoupExtractor, StreamingExtractor
+from tasks.scrapping_task.http_client import ScrapperHttpClient
+from tasks.scrapping_task.scheduling import AdaptiveScrapeScheduler
+from tasks.scrapping_task.sources import AnimegoSource, SourceRegistry
+from tasks.scrapping_task.storage import PostgresSeenEpisodesStorage, SQLiteSeenEpisodesStorage
 
 # load env variables
 load_dotenv()
 
 TOKEN = getenv("TELEGRAM_TOKEN")
 
-dp = Dispatcher()
+# notifications fan-out limits
+BROADCAST_RATE = float(getenv("BROADCAST_RATE", 30))
+BROADCAST_CONCURRENCY = int(getenv("BROADCAST_CONCURRENCY", 30))
+BROADCAST_CHAT_INTERVAL = float(getenv("BROADCAST_CHAT_INTERVAL", 1))
+# shares of the send rate when several priority classes are sending at once
+BROADCAST_WEIGHT_FIRST_DUB = float(getenv("BROADCAST_WEIGHT_FIRST_DUB", 6))
+BROADCAST_WEIGHT_STUDIO = float(getenv("BROADCAST_WEIGHT_STUDIO", 3))
+BROADCAST_WEIGHT_BULK = float(getenv("BROADCAST_WEIGHT_BULK", 1))
+# seconds notifications of one user are collected into a single digest message, 0 - disabled
+NOTIFICATION_DIGEST_WINDOW = float(getenv("NOTIFICATION_DIGEST_WINDOW", 0))
+# hours between reports to admins about users who blocked the bot
+INACTIVE_USERS_REPORT_INTERVAL = float(getenv("INACTIVE_USERS_REPORT_INTERVAL", 24))
+
+# number of concurrent new episode workers
+NOTIFICATION_WORKERS = int(getenv("NOTIFICATION_WORKERS", 4))
+# episodes a worker saves in one transaction
+NOTIFICATION_BATCH_SIZE = int(getenv("NOTIFICATION_BATCH_SIZE", 20))
+# seconds a claimed episode job stays invisible to other workers
+NOTIFICATION_JOB_LEASE = float(getenv("NOTIFICATION_JOB_LEASE", 1800))
+NOTIFICATION_JOB_MAX_ATTEMPTS = int(getenv("NOTIFICATION_JOB_MAX_ATTEMPTS", 5))
+
+# users loaded per page of an admin announcement, progress is saved after each page
+ANNOUNCEMENT_PAGE_SIZE = int(getenv("ANNOUNCEMENT_PAGE_SIZE", 500))
+# seconds an announcement stays with the bot instance sending it without a new checkpoint
+ANNOUNCEMENT_LEASE = float(getenv("ANNOUNCEMENT_LEASE", 300))
+# seconds between edits of the progress message
+ANNOUNCEMENT_PROGRESS_INTERVAL = float(getenv("ANNOUNCEMENT_PROGRESS_INTERVAL", 5))
+
+# where scrapper keeps already seen episodes: postgres or sqlite
+SCRAPPER_STORAGE = getenv("SCRAPPER_STORAGE", "postgres")
+SCRAPPER_SQLITE_PATH = getenv(
+    "SCRAPPER_SQLITE_PATH",
+    str(Path(__file__).parent / "tasks" / "scrapping_task" / "seen_episodes.sqlite3"),
+)
+# how to parse the source page: stream, soup or lxml (requires lxml package)
+SCRAPPER_EXTRACTOR = getenv("SCRAPPER_EXTRACTOR", "stream")
+SCRAPPER_TIMEOUT = float(getenv("SCRAPPER_TIMEOUT", 30))
+ANIMEGO_URL = getenv("ANIMEGO_URL", "https://animego.org/")
+# scrapper polling intervals in seconds: in hours when episodes usually come out,
+# in the rest of time and the upper limit for backoff
+SCRAPPER_HOT_INTERVAL = float(getenv("SCRAPPER_HOT_INTERVAL", 30))
+SCRAPPER_INTERVAL = float(getenv("SCRAPPER_INTERVAL", 300))
+SCRAPPER_MAX_INTERVAL = float(getenv("SCRAPPER_MAX_INTERVAL", 1800))
+
+# seconds admins list is cached for, admin rights are changed directly in the database
+ADMINS_CACHE_TTL = float(getenv("ADMINS_CACHE_TTL", 300))
+
+# how updates are received: polling or webhook
+BOT_MODE = getenv("BOT_MODE", "polling")
+# public https address telegram sends updates to, WEBHOOK_PATH is appended to it
+WEBHOOK_URL = getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = getenv("WEBHOOK_PATH", "/webhook")
+# required in webhook mode: without it anyone who knows the url can send updates as any chat
+WEBHOOK_SECRET = getenv("WEBHOOK_SECRET") or None
+WEBHOOK_HOST = getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(getenv("WEBHOOK_PORT", 8080))
+# updates handled at the same time in webhook mode
+WEBHOOK_CONCURRENCY = int(getenv("WEBHOOK_CONCURRENCY", 32))
+# seconds to finish started handlers and notifications on shutdown
+SHUTDOWN_TIMEOUT = float(getenv("SHUTDOWN_TIMEOUT", 30))
+
+# where dialog states are kept: memory, postgres or redis (requires redis package)
+FSM_STORAGE = getenv("FSM_STORAGE", "memory")
+# seconds since the last change after which a dialog state is forgotten
+FSM_STATE_TTL = int(getenv("FSM_STATE_TTL", 86400))
+REDIS_URL = getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+def create_fsm_storage() -> BaseStorage:
+    if FSM_STORAGE == "postgres":
+        return PostgresStorage(ttl=FSM_STATE_TTL)
+    if FSM_STORAGE == "redis":
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        return RedisStorage.from_url(REDIS_URL, state_ttl=FSM_STATE_TTL, data_ttl=FSM_STATE_TTL)
+    return MemoryStorage()
+
+
+dp = Dispatcher(storage=create_fsm_storage())
 bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 
 
@@ -24,13 +116,17 @@ class Container(containers.DeclarativeContainer):
             "routers",
             "tasks.notification_task"
         ],
-        modules=["tasks.scrapping_task.utils"]
+        modules=[
+            "tasks.scrapping_task.scrapper",
+            "tasks.scrapping_task.utils",
+        ]
     )
 
-    session = providers.Resource(get_session_di)
+    # session of the update or job being processed, see session_scope()
+    session = providers.Callable(current_session)
 
     anime_repository = providers.Factory(
-        AnimeRepository,
+        CachedAnimeRepository,
         session=session
     )
     user_repository = providers.Factory(
@@ -41,3 +137,74 @@ class Container(containers.DeclarativeContainer):
         AdminRepository,
         session=session
     )
+
+    seen_episodes_storage = providers.Selector(
+        providers.Object(SCRAPPER_STORAGE),
+        postgres=providers.Singleton(PostgresSeenEpisodesStorage),
+        sqlite=providers.Singleton(SQLiteSeenEpisodesStorage, path=SCRAPPER_SQLITE_PATH),
+    )
+
+    http_client = providers.Singleton(ScrapperHttpClient, timeout=SCRAPPER_TIMEOUT)
+
+    last_update_extractor = providers.Selector(
+        providers.Object(SCRAPPER_EXTRACTOR),
+        stream=providers.Singleton(StreamingExtractor),
+        soup=providers.Singleton(SoupExtractor),
+        lxml=providers.Singleton(SoupExtractor, features='lxml'),
+    )
+
+    scrape_scheduler = providers.Singleton(
+        AdaptiveScrapeScheduler,
+        hot_interval=SCRAPPER_HOT_INTERVAL,
+        base_interval=SCRAPPER_INTERVAL,
+        max_interval=SCRAPPER_MAX_INTERVAL,
+    )
+
+    # every source is polled on each scrapper run
+    source_registry = providers.Singleton(
+        SourceRegistry,
+        sources=providers.List(
+            providers.Singleton(
+                AnimegoSource,
+                url=ANIMEGO_URL,
+                extractor=last_update_extractor,
+                timeout=SCRAPPER_TIMEOUT,
+            ),
+        ),
+    )
+
+    notification_queue = providers.Singleton(
+        NotificationQueue,
+        capacity=NOTIFICATION_WORKERS * 5,
+        lease=NOTIFICATION_JOB_LEASE,
+        max_attempts=NOTIFICATION_JOB_MAX_ATTEMPTS,
+    )
+
+    broadcaster = providers.Singleton(
+        Broadcaster,
+        bot=providers.Object(bot),
+        rate=BROADCAST_RATE,
+        concurrency=BROADCAST_CONCURRENCY,
+        chat_interval=BROADCAST_CHAT_INTERVAL,
+        on_unreachable=providers.Object(deactivate_unreachable),
+        weights=providers.Object({
+            Priority.FIRST_DUB: BROADCAST_WEIGHT_FIRST_DUB,
+            Priority.STUDIO: BROADCAST_WEIGHT_STUDIO,
+            Priority.BULK: BROADCAST_WEIGHT_BULK,
+        }),
+    )
+
+    notification_digest = providers.Singleton(
+        DigestAggregator,
+        broadcaster=broadcaster,
+        window=NOTIFICATION_DIGEST_WINDOW,
+    )
+
+    announcement_sender = providers.Singleton(
+        AnnouncementSender,
+        bot=providers.Object(bot),
+        broadcaster=broadcaster,
+        page_size=ANNOUNCEMENT_PAGE_SIZE,
+        lease=ANNOUNCEMENT_LEASE,
+        progress_interval=ANNOUNCEMENT_PROGRESS_INTERVAL,
+    )
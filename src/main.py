@@ -6,37 +6,109 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 sys.path.append(str(Path(__file__).parent))
 
+from datetime import timedelta
+
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from dependency_injector.wiring import Provide, inject
 
-from config import Container, bot, dp
+from config import (
+    BOT_MODE,
+    BROADCAST_RATE,
+    INACTIVE_USERS_REPORT_INTERVAL,
+    NOTIFICATION_BATCH_SIZE,
+    NOTIFICATION_WORKERS,
+    SHUTDOWN_TIMEOUT,
+    WEBHOOK_CONCURRENCY,
+    WEBHOOK_HOST,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+    Container,
+    bot,
+    dp,
+)
 from logs.log_config import setup_logger
 from repository.config import sessionmanager
+from repository.fsm_storage import PostgresStorage
 from routers.admin_commands import router as commands_router
 from routers.handlers import router as handlers_router
-from tasks.notification_task.notify_and_save import new_episode_worker
+from routers.middleware import DbSessionMiddleware
+from tasks.notification_task.announcements import AnnouncementSender
+from tasks.notification_task.notify_and_save import start_notification_workers
+from tasks.notification_task.recipients import report_reclaimed_capacity
+from tasks.scrapping_task.http_client import ScrapperHttpClient
+from tasks.scrapping_task.scheduling import AdaptiveScrapeScheduler
 from tasks.scrapping_task.scrapper import scrapper
+from tasks.scrapping_task.utils import import_legacy_storage
+from webhook import run_webhook
+
 
+@inject
+async def main(
+    http_client: ScrapperHttpClient = Provide[Container.http_client],
+    scrape_scheduler: AdaptiveScrapeScheduler = Provide[Container.scrape_scheduler],
+    announcement_sender: AnnouncementSender = Provide[Container.announcement_sender],
+) -> None:
+    if BOT_MODE == 'webhook' and not WEBHOOK_SECRET:
+        raise RuntimeError('WEBHOOK_SECRET обязателен в режиме webhook')
 
-async def main() -> None:
     # init db
     sessionmanager.init()
+    await import_legacy_storage()
 
-    queue = asyncio.Queue()
+    # keep-alive http session for scrapper, lives as long as the app
+    await http_client.start()
 
-    # init periodic scrapping task
+    # init periodic scrapping task, interval adapts to release hours
     scheduler = AsyncIOScheduler()
-    scheduler.add_job(scrapper, 'interval', minutes=5, args=[queue])
+    scrape_scheduler.start(scheduler, scrapper)
+    if isinstance(dp.fsm.storage, PostgresStorage):
+        scheduler.add_job(dp.fsm.storage.purge_expired, 'interval', hours=1)
+    # announcements interrupted by restart or abandoned by another instance
+    scheduler.add_job(announcement_sender.resume, 'interval', minutes=1)
+    scheduler.add_job(
+        report_reclaimed_capacity,
+        'interval',
+        hours=INACTIVE_USERS_REPORT_INTERVAL,
+        kwargs={'bot': bot, 'period': timedelta(hours=INACTIVE_USERS_REPORT_INTERVAL), 'rate': BROADCAST_RATE},
+    )
     scheduler.start()
+    await announcement_sender.resume()
 
+    # every update is handled with its own session from the pool
+    db_session_middleware = DbSessionMiddleware()
+    dp.update.outer_middleware(db_session_middleware)
     dp.include_router(commands_router)
     dp.include_router(handlers_router)
 
-    # start bot
-    start_app_task = asyncio.create_task(dp.start_polling(bot))
-
-    # create infinite task for handling notifications when new episode is out
-    db_handler = asyncio.create_task(new_episode_worker(queue))
-    await asyncio.gather(start_app_task, db_handler)
+    # infinite tasks for handling notifications when new episode is out
+    workers = start_notification_workers(NOTIFICATION_WORKERS, NOTIFICATION_BATCH_SIZE)
+    try:
+        # both return after SIGINT/SIGTERM
+        if BOT_MODE == 'webhook':
+            await run_webhook(
+                dp,
+                bot,
+                url=WEBHOOK_URL,
+                path=WEBHOOK_PATH,
+                host=WEBHOOK_HOST,
+                port=WEBHOOK_PORT,
+                concurrency=WEBHOOK_CONCURRENCY,
+                secret_token=WEBHOOK_SECRET,
+                shutdown_timeout=SHUTDOWN_TIMEOUT,
+            )
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot, close_bot_session=False)
+            # polling doesn't wait for handlers of already received updates
+            await db_session_middleware.drain(SHUTDOWN_TIMEOUT)
+    finally:
+        scheduler.shutdown(wait=False)
+        await workers.drain(SHUTDOWN_TIMEOUT)
+        await announcement_sender.stop(SHUTDOWN_TIMEOUT)
+        await http_client.close()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
@@ -44,6 +116,7 @@ if __name__ == "__main__":
 
     # start DI container
     container = Container()
+    container.wire(modules=[__name__])
 
     if sys.platform == 'win32':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
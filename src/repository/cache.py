@@ -0,0 +1,50 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """LRU кэш, записи которого живут не дольше `ttl` секунд."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            self._data.pop(key, None)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic() + self._ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def as_lines(self) -> list[str]:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0.0
+        return [
+            f'Записей: {len(self._data)}/{self._maxsize}',
+            f'Попаданий: {self.hits}, промахов: {self.misses} ({hit_rate:.0f}%)',
+        ]
+
+
+# seasons and dubbed seasons, changed only by admins
+catalog_cache = TTLCache(
+    maxsize=int(os.getenv('CATALOG_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('CATALOG_CACHE_TTL', 300)),
+)
@@ -1,16 +1,76 @@
+import logging
 import os
+import time
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from typing import AsyncIterator
 
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from .orm_models import Base
 
+# imported by config.py before it loads .env, and repository modules read settings on import
+load_dotenv()
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+# seconds to wait for a free connection before TimeoutError
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+# connections older than this are reopened, postgres restarts don't leave stale ones forever
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# milliseconds, 0 disables the limit
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 30000))
+# psycopg prepares a statement on the server after it was executed this many times
+DB_PREPARE_THRESHOLD = int(os.getenv('DB_PREPARE_THRESHOLD', 5))
+# seconds, slower queries are logged
+DB_SLOW_QUERY = float(os.getenv('DB_SLOW_QUERY', 0.5))
+DB_ECHO = os.getenv('DB_ECHO', 'false').lower() == 'true'
+
+
+@dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    checkout_time: float = 0.0
+    max_checkout_time: float = 0.0
+    slow_queries: int = 0
+
+    def record_checkout(self, elapsed: float):
+        self.checkouts += 1
+        self.checkout_time += elapsed
+        self.max_checkout_time = max(self.max_checkout_time, elapsed)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул соединений, который замеряет время ожидания свободного соединения."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        # pool is recreated after connections are invalidated, metrics are kept
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.record_checkout(time.perf_counter() - started)
+
 
 class DatabaseManager:
     def __init__(self) -> None:
@@ -18,12 +78,53 @@ class DatabaseManager:
         self._db_session: async_sessionmaker[AsyncSession] | None = None
 
     def init(self, url=None):
-        if url:
-            self._engine = create_async_engine(url, echo=True)
-        else:
-            self._engine = create_async_engine(os.getenv('DB_URI'))
+        url = url or os.getenv('DB_URI')
+
+        connect_args = {}
+        if DB_STATEMENT_TIMEOUT:
+            connect_args['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'
+        if make_url(url).get_driver_name() == 'psycopg':
+            connect_args['prepare_threshold'] = DB_PREPARE_THRESHOLD
+
+        self._engine = create_async_engine(
+            url,
+            echo=DB_ECHO,
+            poolclass=InstrumentedPool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            connect_args=connect_args,
+        )
+        event.listen(self._engine.sync_engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(self._engine.sync_engine, 'after_cursor_execute', self._after_cursor_execute)
         self._db_session = async_sessionmaker(self._engine, expire_on_commit=False)
 
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started']
+        if elapsed >= DB_SLOW_QUERY:
+            self._engine.sync_engine.pool.metrics.slow_queries += 1
+            logging.warning(f'Медленный запрос ({elapsed:.2f}s): {" ".join(statement.split())[:500]}')
+
+    def as_lines(self) -> list[str]:
+        if self._engine is None:
+            return []
+
+        pool: InstrumentedPool = self._engine.sync_engine.pool
+        metrics = pool.metrics
+        avg = metrics.checkout_time / metrics.checkouts if metrics.checkouts else 0.0
+        return [
+            f'Соединений занято: {pool.checkedout()}, свободно: {pool.checkedin()} (пул {pool.size()})',
+            f'Сверх пула: {max(pool.overflow(), 0)}/{DB_MAX_OVERFLOW}',
+            f'Ожидание соединения: среднее {avg * 1000:.1f}ms, макс. {metrics.max_checkout_time * 1000:.1f}ms',
+            f'Медленных запросов (>{DB_SLOW_QUERY}s): {metrics.slow_queries}',
+        ]
+
     async def create_all(self):
         if self._engine is None:
             raise NotImplementedError
@@ -49,12 +150,31 @@ class DatabaseManager:
 sessionmanager = DatabaseManager()
 
 
+_current_session: ContextVar[AsyncSession | None] = ContextVar('current_session', default=None)
+
+
 @asynccontextmanager
 async def get_session():
     async with sessionmanager.session() as session:
         yield session
 
 
-async def get_session_di():
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """
+    Сессия на время обработки одного апдейта или задачи. Пока она открыта,
+    репозитории из контейнера получают ее через current_session().
+    """
     async with sessionmanager.session() as session:
-        yield session
+        token = _current_session.set(session)
+        try:
+            yield session
+        finally:
+            _current_session.reset(token)
+
+
+def current_session() -> AsyncSession:
+    session = _current_session.get()
+    if session is None:
+        raise RuntimeError('Сессия запрошена вне session_scope()')
+    return session
@@ -0,0 +1,101 @@
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from .config import get_session
+from .orm_models import FSMState
+
+_is_alive = FSMState.expires_at > func.now()
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM хранилище в таблице fsm_states: состояния переживают перезапуск и общие
+    для всех экземпляров бота. Запись живет `ttl` секунд с последнего изменения,
+    каждая операция - один запрос, в том числе update_data.
+    """
+
+    def __init__(self, ttl: float = 86400, key_builder: KeyBuilder | None = None):
+        self._ttl = timedelta(seconds=ttl)
+        self._key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+    async def close(self) -> None:
+        pass
+
+    def _insert(self, key: StorageKey, state: str | None = None, data: Dict[str, Any] | None = None):
+        # expiration is counted by the database clock, like the checks below
+        return insert(FSMState).values(
+            key=self._key_builder.build(key),
+            state=state,
+            data=data or {},
+            expires_at=func.now() + self._ttl,
+        )
+
+    async def _execute(self, stmt):
+        async with get_session() as session:
+            res = await session.execute(stmt)
+            await session.commit()
+            return res
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        stmt = self._insert(key, state=state.state if isinstance(state, State) else state)
+        await self._execute(
+            stmt.on_conflict_do_update(
+                index_elements=[FSMState.key],
+                set_={
+                    'state': stmt.excluded.state,
+                    # data of an expired record is not resurrected
+                    'data': case((_is_alive, FSMState.data), else_=stmt.excluded.data),
+                    'expires_at': stmt.excluded.expires_at,
+                },
+            )
+        )
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        res = await self._execute(
+            select(FSMState.state).where(FSMState.key == self._key_builder.build(key), _is_alive)
+        )
+        return res.scalar()
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        stmt = self._insert(key, data=data)
+        await self._execute(
+            stmt.on_conflict_do_update(
+                index_elements=[FSMState.key],
+                set_={
+                    'state': case((_is_alive, FSMState.state)),
+                    'data': stmt.excluded.data,
+                    'expires_at': stmt.excluded.expires_at,
+                },
+            )
+        )
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        res = await self._execute(
+            select(FSMState.data).where(FSMState.key == self._key_builder.build(key), _is_alive)
+        )
+        return res.scalar() or {}
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        # jsonb is merged by the database in one statement instead of get_data + set_data
+        stmt = self._insert(key, data=data)
+        res = await self._execute(
+            stmt.on_conflict_do_update(
+                index_elements=[FSMState.key],
+                set_={
+                    'state': case((_is_alive, FSMState.state)),
+                    'data': case((_is_alive, FSMState.data.op('||')(stmt.excluded.data)), else_=stmt.excluded.data),
+                    'expires_at': stmt.excluded.expires_at,
+                },
+            )
+            .returning(FSMState.data)
+        )
+        return res.scalar_one()
+
+    async def purge_expired(self) -> int:
+        res = await self._execute(delete(FSMState).where(~_is_alive).returning(FSMState.key))
+        return len(res.all())
@@ -1,9 +1,10 @@
-from datetime import date
+from datetime import date, datetime
 from enum import Enum
 from typing import Optional
 from uuid import UUID, uuid4
 
-from sqlalchemy import BigInteger, ForeignKey, MetaData, UniqueConstraint
+from sqlalchemy import BigInteger, ForeignKey, Index, MetaData, UniqueConstraint, func, text, true
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -24,23 +25,22 @@ class User(Base):
     id: Mapped[int] = mapped_column(BigInteger(), primary_key=True)
     joined_date: Mapped[date] = mapped_column(default=date.today)
     is_admin: Mapped[bool | None] = mapped_column(default=False)
+    # false after the bot was blocked or the account deleted, such users get no messages
+    is_active: Mapped[bool] = mapped_column(default=True, server_default=true())
+    deactivated_at: Mapped[datetime | None]
+    # subscriptions are changed and read through UsersRepository without loading the collection
     animelist: Mapped[list['DubbedSeason']] = relationship(
         back_populates='followers',
         secondary='user_season_secondary',
-        lazy='selectin',
+        lazy='raise',
     )
 
-    def subscribe(self, season: 'DubbedSeason'):
-        self.animelist.append(season)
-
-    def is_subsribed(self, season: 'DubbedSeason'):
-        return season in self.animelist
-
-    def unsubscribe(self, season: 'DubbedSeason'):
-        self.animelist.remove(season)
-
-    def unsubscribe_all(self):
-        self.animelist.clear()
+    __table_args__ = (
+        # admins are a handful of rows among all users
+        Index('ix_users_admins', 'id', postgresql_where=text('is_admin')),
+        # recipients are read in id order among active users only
+        Index('ix_users_active', 'id', postgresql_where=text('is_active')),
+    )
 
 
 class Origin(Base):
@@ -65,10 +65,16 @@ class Season(Base):
     title_en: Mapped[str]
     status: Mapped[Optional['SeasonStatus']] = mapped_column(default=SeasonStatus.ONGOING)
     cover: Mapped[str | None]
+    # telegram file_id of the cover after its first upload, sent instead of the url
+    cover_file_id: Mapped[str | None]
 
     origin: Mapped['Origin'] = relationship(back_populates='seasons')
     involved_studios: Mapped[list['DubbedSeason']] = relationship(back_populates='season')
 
+    __table_args__ = (
+        UniqueConstraint('title_ru'),
+    )
+
 
 class DubbedSeason(Base):
     __tablename__ = 'seasons_with_studio'
@@ -77,7 +83,7 @@ class DubbedSeason(Base):
     season_id: Mapped[int] = mapped_column(ForeignKey('seasons.id', ondelete='CASCADE'))
     studio_name: Mapped[int] = mapped_column(ForeignKey('voiceover_studios.name', ondelete='CASCADE'))
     # for denormolization
-    season_name: Mapped[str]
+    season_name: Mapped[str] = mapped_column(index=True)
 
     season: Mapped['Season'] = relationship(back_populates='involved_studios')
     episodes: Mapped[list['Episode']] = relationship(back_populates='season')
@@ -98,6 +104,8 @@ class Episode(Base):
     id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
     name: Mapped[str | None]
     episode_number: Mapped[int]
+    # when the episode was found by scrapper
+    created_at: Mapped[datetime] = mapped_column(default=datetime.now, server_default=func.now())
 
     season_id: Mapped[int] = mapped_column(ForeignKey('seasons_with_studio.id', ondelete='CASCADE'))
     season: Mapped['DubbedSeason'] = relationship(back_populates='episodes')
@@ -129,7 +137,8 @@ class UserSeasonSecondary(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'))
-    season_id: Mapped[int] = mapped_column(ForeignKey('seasons_with_studio.id', ondelete='CASCADE'))
+    # (user_id, season_id) unique index doesn't help to find followers of a season
+    season_id: Mapped[int] = mapped_column(ForeignKey('seasons_with_studio.id', ondelete='CASCADE'), index=True)
 
     __table_args__ = (
         UniqueConstraint('user_id', 'season_id'),
@@ -143,3 +152,63 @@ class SeasonStudioSecondary(Base):
 
     season_id: Mapped[int] = mapped_column(ForeignKey('seasons_with_studio.id', ondelete='CASCADE'))
     studio_id: Mapped[int] = mapped_column(ForeignKey('voiceover_studios.id', ondelete='CASCADE'))
+
+
+class SeenEpisode(Base):
+    __tablename__ = 'seen_episodes'
+
+    # repr(AnimeEpisode)
+    key: Mapped[str] = mapped_column(primary_key=True)
+    seen_at: Mapped[datetime] = mapped_column(default=datetime.now)
+
+
+class EpisodeJob(Base):
+    __tablename__ = 'episode_jobs'
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # repr(AnimeEpisode)
+    key: Mapped[str] = mapped_column(unique=True)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    # job is claimed by a worker until this moment
+    locked_until: Mapped[datetime | None]
+    attempts: Mapped[int] = mapped_column(default=0)
+
+
+# users already notified about an episode, so redelivered jobs don't notify twice
+class NotificationDelivery(Base):
+    __tablename__ = 'notification_deliveries'
+
+    episode_key: Mapped[str] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger(), primary_key=True)
+    sent_at: Mapped[datetime] = mapped_column(default=datetime.now)
+
+
+# aiogram FSM state and data of a chat, see PostgresStorage
+class FSMState(Base):
+    __tablename__ = 'fsm_states'
+
+    key: Mapped[str] = mapped_column(primary_key=True)
+    state: Mapped[str | None]
+    data: Mapped[dict] = mapped_column(JSONB, default=dict)
+    expires_at: Mapped[datetime]
+
+
+# admin message to all users, sent page by page in users.id order and resumed after restart
+class Announcement(Base):
+    __tablename__ = 'announcements'
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    text: Mapped[str]
+    created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    # admin chat with the auto-updating progress message
+    chat_id: Mapped[int] = mapped_column(BigInteger())
+    progress_message_id: Mapped[int | None]
+    total: Mapped[int] = mapped_column(default=0)
+    # checkpoint: users with id up to this one are already processed
+    last_user_id: Mapped[int] = mapped_column(BigInteger(), default=0)
+    sent: Mapped[int] = mapped_column(default=0)
+    failed: Mapped[int] = mapped_column(default=0)
+    blocked: Mapped[int] = mapped_column(default=0)
+    # announcement is being sent by a bot instance until this moment
+    locked_until: Mapped[datetime | None]
+    finished_at: Mapped[datetime | None]
@@ -1,18 +1,27 @@
 import logging
+from datetime import datetime, timedelta
 
-from sqlalchemy import func, or_, select, update
+from sqlalchemy import delete, extract, func, or_, select, true, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from transliterate import translit
 
+from .cache import catalog_cache
 from .orm_models import (
+    Announcement,
     DubbedSeason,
     Episode,
+    EpisodeJob,
+    NotificationDelivery,
     Origin,
     Season,
     SeasonStatus,
+    SeenEpisode,
     User,
+    UserSeasonSecondary,
     VoiceoverStudio,
 )
+from .search import season_search_index
 
 
 class UsersRepository:
@@ -30,27 +39,119 @@ class UsersRepository:
     async def get_user_by_id(self, user_id: int):
         return await self._session.get(User, user_id)
 
-    async def subscribed_on_season_users_ids(self, season: DubbedSeason) -> list[int]:
-        query = select(User.id).where(User.animelist.contains(season))
-        result = await self._session.execute(query)
+    async def get_subscriptions(self, user_id: int) -> list[DubbedSeason]:
+        res = await self._session.execute(
+            select(DubbedSeason)
+            .join(UserSeasonSecondary, UserSeasonSecondary.season_id == DubbedSeason.id)
+            .where(UserSeasonSecondary.user_id == user_id)
+            .order_by(UserSeasonSecondary.id)
+        )
+        return res.scalars().all()
 
-        return result.scalars().all()
+    async def subscribe(self, user_id: int, dubbed_season_id: int) -> bool:
+        """False, если пользователь уже подписан."""
+        res = await self._session.execute(
+            insert(UserSeasonSecondary)
+            .values(user_id=user_id, season_id=dubbed_season_id)
+            .on_conflict_do_nothing(index_elements=[UserSeasonSecondary.user_id, UserSeasonSecondary.season_id])
+            .returning(UserSeasonSecondary.id)
+        )
+        return res.scalar() is not None
 
-    async def subscribed_on_first_dubb_users_ids(self, season_name: str) -> list[int]:
+    async def unsubscribe(self, user_id: int, dubbed_season_id: int) -> bool:
         res = await self._session.execute(
-            select(User.id)
-            .where(User.animelist.any(season_name=season_name, studio_name='#subscribe_on_first'))
+            delete(UserSeasonSecondary)
+            .where(UserSeasonSecondary.user_id == user_id, UserSeasonSecondary.season_id == dubbed_season_id)
+            .returning(UserSeasonSecondary.id)
+        )
+        return res.scalar() is not None
+
+    async def unsubscribe_all(self, user_id: int) -> int:
+        res = await self._session.execute(
+            delete(UserSeasonSecondary)
+            .where(UserSeasonSecondary.user_id == user_id)
+            .returning(UserSeasonSecondary.id)
+        )
+        return len(res.all())
+
+    async def count_active(self) -> int:
+        res = await self._session.execute(select(func.count()).select_from(User).where(User.is_active))
+        return res.scalar_one()
+
+    async def active_users_ids_after(self, last_id: int, limit: int) -> list[int]:
+        """
+        Следующая страница id активных пользователей по возрастанию: keyset пагинация
+        по первичному ключу не зависит от смещения и не держит курсор между страницами.
+        """
+        res = await self._session.execute(
+            select(User.id).where(User.id > last_id, User.is_active).order_by(User.id).limit(limit)
         )
         return res.scalars().all()
 
-    async def all(self) -> list[User]:
-        users = await self._session.execute(select(User))
-        return users.scalars().all()
+    async def deactivate(self, users_ids: list[int]) -> int:
+        """Сколько пользователей выключено, уже неактивные не считаются."""
+        res = await self._session.execute(
+            update(User)
+            .where(User.id.in_(users_ids), User.is_active)
+            .values(is_active=False, deactivated_at=func.now())
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+        return len(res.all())
+
+    async def activate(self, user_id: int) -> bool:
+        """False, если пользователь и так активен."""
+        res = await self._session.execute(
+            update(User)
+            .where(User.id == user_id, ~User.is_active)
+            .values(is_active=True, deactivated_at=None)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+        return res.scalar() is not None
+
+    async def inactive_users_report(self, since: datetime):
+        """
+        Сколько пользователей неактивно, сколько из них выключено с `since`, сколько
+        у них подписок и сколько уведомлений об эпизодах с `since` им не отправлено.
+        """
+        skipped = (
+            select(func.count())
+            .select_from(Episode)
+            .join(UserSeasonSecondary, UserSeasonSecondary.season_id == Episode.season_id)
+            .join(User, User.id == UserSeasonSecondary.user_id)
+            .where(~User.is_active, Episode.created_at >= since, Episode.created_at > User.deactivated_at)
+            .correlate(None)
+            .scalar_subquery()
+        )
+        subscriptions = (
+            select(func.count())
+            .select_from(UserSeasonSecondary)
+            .join(User, User.id == UserSeasonSecondary.user_id)
+            .where(~User.is_active)
+            .correlate(None)
+            .scalar_subquery()
+        )
+        res = await self._session.execute(
+            select(
+                func.count().label('inactive'),
+                func.count().filter(User.deactivated_at >= since).label('deactivated'),
+                subscriptions.label('subscriptions'),
+                skipped.label('skipped'),
+            )
+            .select_from(User)
+            .where(~User.is_active)
+        )
+        return res.one()
 
     async def get_admins(self) -> list[User]:
-        users = await self._session.execute(select(User).where(User.is_admin.is_(True)))
+        users = await self._session.execute(select(User).where(User.is_admin))
         return users.scalars().all()
 
+    async def get_admins_ids(self) -> list[int]:
+        res = await self._session.execute(select(User.id).where(User.is_admin))
+        return res.scalars().all()
+
     def add(self, user_id):
         user = User(id=user_id)
         self._session.add(user)
@@ -59,6 +160,10 @@ class UsersRepository:
 class AdminRepository:
     def __init__(self, session: AsyncSession):
         self._session = session
+        # set when seasons or dubbed seasons change, episodes don't touch the cache
+        self._catalog_changed = False
+        # the search index holds only seasons, new dubs don't stale it
+        self._seasons_changed = False
 
     async def commit(self):
         try:
@@ -67,6 +172,15 @@ class AdminRepository:
             await self._session.rollback()
             logging.error(str(e))
             raise
+        if self._catalog_changed:
+            catalog_cache.clear()
+        if self._seasons_changed:
+            season_search_index.invalidate()
+        self._catalog_changed = self._seasons_changed = False
+
+    async def rollback(self):
+        await self._session.rollback()
+        self._catalog_changed = self._seasons_changed = False
 
     def add_origin(self, title_ru: str, title_en: str):
         new_origin = Origin(title_ru=title_ru, title_en=title_en)
@@ -81,6 +195,7 @@ class AdminRepository:
             status=status,
         )
         self._session.add(new_season)
+        self._catalog_changed = self._seasons_changed = True
 
     def add_studio(self, studio_name):
         new_season = VoiceoverStudio(name=studio_name)
@@ -89,16 +204,13 @@ class AdminRepository:
     def add_dubbed_season(self, season_id, season_name, studio_name):
         season_with_studio = DubbedSeason(season_id=season_id, studio_name=studio_name, season_name=season_name)
         self._session.add(season_with_studio)
+        self._catalog_changed = True
         return season_with_studio
 
-    def add_episode(self, episode_number: int, season_id: int, name: str | None = None):
-        episode = Episode(episode_number=episode_number, season_id=season_id, name=name)
-        self._session.add(episode)
-        return episode
-
     async def update_season_status(self, season_name, status):
         stmt = update(Season).where(Season.title_ru == season_name).values(status=status)
         await self._session.execute(stmt)
+        self._catalog_changed = self._seasons_changed = True
 
     async def get_season_by_name(self, season_name: str):
         res = await self._session.execute(
@@ -107,19 +219,92 @@ class AdminRepository:
         )
         return res.scalar_one_or_none()
 
-    async def get_dubbed_season_by_season_and_studio_name(
-        self,
-        season_name: str,
-        studio_name: str
-    ) -> DubbedSeason | None:
+    async def bulk_add_origins(self, origins: list[dict]) -> int:
+        if not origins:
+            return 0
         res = await self._session.execute(
-            select(DubbedSeason)
-            .where(
-                DubbedSeason.season.has(title_ru=season_name),
-                DubbedSeason.studio_name == studio_name
+            insert(Origin)
+            .values(origins)
+            .on_conflict_do_nothing(index_elements=[Origin.title_ru, Origin.title_en])
+            .returning(Origin.id)
+        )
+        return len(res.all())
+
+    async def bulk_add_studios(self, names: list[str]) -> int:
+        if not names:
+            return 0
+        res = await self._session.execute(
+            insert(VoiceoverStudio)
+            .values([{'name': name} for name in names])
+            .on_conflict_do_nothing(index_elements=[VoiceoverStudio.name])
+            .returning(VoiceoverStudio.id)
+        )
+        return len(res.all())
+
+    async def bulk_upsert_seasons(self, seasons: list[dict]) -> int:
+        """Добавляет сезоны, у уже существующих (по title_ru) обновляет остальные поля."""
+        if not seasons:
+            return 0
+        stmt = insert(Season).values(seasons)
+        res = await self._session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Season.title_ru],
+                set_={
+                    'origin_id': stmt.excluded.origin_id,
+                    'title_en': stmt.excluded.title_en,
+                    'status': stmt.excluded.status,
+                    'cover': func.coalesce(stmt.excluded.cover, Season.cover),
+                },
             )
+            .returning(Season.id)
         )
-        return res.scalar_one_or_none()
+        upserted = len(res.all())
+        if upserted:
+            self._catalog_changed = self._seasons_changed = True
+        return upserted
+
+    async def bulk_add_episodes(self, episodes: list[dict]) -> set[tuple[int, int]]:
+        """(season_id, episode_number) добавленных эпизодов, уже существующие пропускаются."""
+        if not episodes:
+            return set()
+        res = await self._session.execute(
+            insert(Episode)
+            .values(episodes)
+            .on_conflict_do_nothing(index_elements=[Episode.season_id, Episode.episode_number])
+            .returning(Episode.season_id, Episode.episode_number)
+        )
+        return {tuple(row) for row in res.all()}
+
+    async def bulk_add_dubbed_seasons(self, dubbed_seasons: list[dict]) -> int:
+        if not dubbed_seasons:
+            return 0
+        res = await self._session.execute(
+            insert(DubbedSeason)
+            .values(dubbed_seasons)
+            .on_conflict_do_nothing(index_elements=[DubbedSeason.season_id, DubbedSeason.studio_name])
+            .returning(DubbedSeason.id)
+        )
+        added = len(res.all())
+        self._catalog_changed |= added > 0
+        return added
+
+    async def origins_ids_by_names(self, names: set[str]) -> dict[str, int]:
+        res = await self._session.execute(
+            select(Origin.title_ru, Origin.id).where(Origin.title_ru.in_(names))
+        )
+        return dict(res.all())
+
+    async def seasons_ids_by_names(self, names: set[str]) -> dict[str, int]:
+        res = await self._session.execute(
+            select(Season.title_ru, Season.id).where(Season.title_ru.in_(names))
+        )
+        return dict(res.all())
+
+    async def existing_studios(self, names: set[str]) -> set[str]:
+        res = await self._session.execute(
+            select(VoiceoverStudio.name).where(VoiceoverStudio.name.in_(names))
+        )
+        return set(res.scalars())
 
     async def get_origin_by_name(self, origin_name: str):
         res = await self._session.execute(
@@ -160,19 +345,12 @@ class AnimeRepository:
     async def get_season_by_id(self, season_id: int) -> Season:
         return await self._session.get(Season, season_id)
 
-    async def get_dubbed_season_by_season_and_studio_name(self, season_name: str, studio_name: str) -> DubbedSeason:
-        res = await self._session.execute(
-            select(DubbedSeason)
-            .where(
-                DubbedSeason.season.has(title_ru=season_name),
-                DubbedSeason.studio_name == studio_name
-            )
-        )
-        return res.scalar_one_or_none()
-
     async def get_dubbed_season_by_id(self, season_studio_id: int) -> DubbedSeason:
         return await self._session.get(DubbedSeason, season_studio_id)
 
+    async def save_cover_file_id(self, season_id: int, file_id: str):
+        await self._session.execute(update(Season).where(Season.id == season_id).values(cover_file_id=file_id))
+
     async def get_seasons_by_query(self, user_query: str) -> list[Season]:
 
         def make_query(user_query):
@@ -205,15 +383,310 @@ class AnimeRepository:
             return result.scalars().all()
         return frozen().scalars().all()
 
-    async def check_if_new_episodes_exist(self, season_name: str, episode_number: int):
-        query = (
-            select(Episode.id)
+    async def episodes_release_histogram(self, since: datetime) -> dict[tuple[int, int], int]:
+        """Сколько эпизодов вышло в каждый (день недели ISO, час) начиная с `since`."""
+        weekday = extract('isodow', Episode.created_at)
+        hour = extract('hour', Episode.created_at)
+        res = await self._session.execute(
+            select(weekday, hour, func.count())
+            .where(Episode.created_at >= since)
+            .group_by(weekday, hour)
+        )
+        return {(int(weekday), int(hour)): count for weekday, hour, count in res.all()}
+
+    async def resolve_new_episode(self, season_name: str, studio_name: str, episode_number: int):
+        """
+        Одним запросом находит сезон, сезон с озвучкой, признак первой озвучки серии
+        и id пользователей, которых нужно уведомить: подписчиков первой озвучки и
+        подписчиков студии отдельно, пользователь может быть в обоих списках.
+        Если сезона нет - None, если нет сезона с такой озвучкой - dubbed_season_id is None.
+        """
+        season = (
+            select(Season.id, Season.title_ru, Season.cover, Season.cover_file_id)
+            .where(Season.title_ru == season_name)
+            .cte('season')
+        )
+        dubbed_season = (
+            select(DubbedSeason.id)
+            .join(season, DubbedSeason.season_id == season.c.id)
+            .where(DubbedSeason.studio_name == studio_name)
+            .cte('dubbed_season')
+        )
+        # the episode of this dub itself doesn't count: it's already saved when the job is redelivered
+        first_dub = select(
+            ~select(Episode.id)
             .join(DubbedSeason)
             .where(Episode.episode_number == episode_number,
-                   DubbedSeason.season_name == season_name)
-            .limit(1)
+                   DubbedSeason.season_name == season_name,
+                   Episode.season_id.not_in(select(dubbed_season.c.id)))
+            .exists()
+            .label('is_first_dub')
+        ).cte('first_dub')
+
+        # first dub subscribers are notified before studio ones, so they are selected separately
+        studio_users_ids = (
+            select(UserSeasonSecondary.user_id)
+            .join(User, User.id == UserSeasonSecondary.user_id)
+            .where(UserSeasonSecondary.season_id.in_(select(dubbed_season.c.id)), User.is_active)
+        )
+        first_dub_users_ids = (
+            select(UserSeasonSecondary.user_id)
+            .join(User, User.id == UserSeasonSecondary.user_id)
+            .join(DubbedSeason, UserSeasonSecondary.season_id == DubbedSeason.id)
+            .join(first_dub, first_dub.c.is_first_dub)
+            .where(User.is_active,
+                   DubbedSeason.season_name == season_name,
+                   DubbedSeason.studio_name == '#subscribe_on_first')
+        )
+
+        query = (
+            select(
+                season.c.id.label('season_id'),
+                season.c.title_ru,
+                season.c.cover,
+                season.c.cover_file_id,
+                dubbed_season.c.id.label('dubbed_season_id'),
+                first_dub.c.is_first_dub,
+                func.array(first_dub_users_ids.scalar_subquery()).label('first_dub_users_ids'),
+                func.array(studio_users_ids.scalar_subquery()).label('studio_users_ids'),
+            )
+            .select_from(season)
+            .outerjoin(dubbed_season, true())
         )
         res = await self._session.execute(query)
-        if res.scalar():
-            return True
-        return False
+        return res.one_or_none()
+
+
+class CachedAnimeRepository(AnimeRepository):
+    """
+    AnimeRepository с read-through кэшем сезонов и озвучек.
+
+    В кэше лежат объекты, отвязанные от сессии, а наружу отдаются их копии,
+    привязанные к текущей сессии через merge(load=False) - без запросов в базу.
+    Кэш сбрасывается при коммите AdminRepository, который менял сезоны или озвучки.
+    """
+
+    async def _cached(self, key, load, *args):
+        cached = catalog_cache.get(key)
+        if cached is None:
+            cached = await load(*args)
+            if cached is None:
+                return None
+            if not isinstance(cached, Season | DubbedSeason):
+                cached = list(cached)
+            for obj in cached if isinstance(cached, list) else [cached]:
+                self._session.expunge(obj)
+            catalog_cache.set(key, cached)
+
+        if isinstance(cached, list):
+            return [await self._session.merge(obj, load=False) for obj in cached]
+        return await self._session.merge(cached, load=False)
+
+    async def get_dubbed_seasons_by_season_id(self, season_id: int):
+        return await self._cached(('dubbed_seasons', season_id), super().get_dubbed_seasons_by_season_id, season_id)
+
+    async def get_season_by_name(self, season_name: str):
+        return await self._cached(('season_name', season_name), super().get_season_by_name, season_name)
+
+    async def get_season_by_id(self, season_id: int) -> Season:
+        return await self._cached(('season', season_id), super().get_season_by_id, season_id)
+
+    async def get_dubbed_season_by_id(self, season_studio_id: int) -> DubbedSeason:
+        return await self._cached(('dubbed_season', season_studio_id), super().get_dubbed_season_by_id, season_studio_id)
+
+    async def save_cover_file_id(self, season_id: int, file_id: str):
+        await super().save_cover_file_id(season_id, file_id)
+        # cached seasons are detached copies and can't be changed in place
+        catalog_cache.clear()
+
+    async def _searchable_seasons(self) -> list[tuple[int, str, str]]:
+        res = await self._session.execute(
+            select(Season.id, Season.title_ru, Season.title_en)
+            .where(Season.status != SeasonStatus.RELEASED)
+        )
+        return res.all()
+
+    async def get_seasons_by_query(self, user_query: str) -> list[Season]:
+        await season_search_index.refresh(self._searchable_seasons)
+        seasons_ids = season_search_index.search(user_query)
+        if not seasons_ids:
+            return []
+        res = await self._session.execute(select(Season).where(Season.id.in_(seasons_ids)))
+        seasons = {season.id: season for season in res.scalars()}
+        return [seasons[season_id] for season_id in seasons_ids if season_id in seasons]
+
+
+class ScrapperRepository:
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    async def commit(self):
+        await self._session.commit()
+
+    async def unseen_episodes(self, keys: list[str]) -> list[str]:
+        res = await self._session.execute(select(SeenEpisode.key).where(SeenEpisode.key.in_(keys)))
+        seen = set(res.scalars().all())
+        return [key for key in keys if key not in seen]
+
+    async def add_seen_episodes(self, keys: list[str]) -> list[str]:
+        """Сохраняет ключи эпизодов, возвращает только те, которых еще не было."""
+        res = await self._session.execute(
+            insert(SeenEpisode)
+            .values([{'key': key} for key in keys])
+            .on_conflict_do_nothing(index_elements=[SeenEpisode.key])
+            .returning(SeenEpisode.key)
+        )
+        return res.scalars().all()
+
+
+class NotificationQueueRepository:
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    async def commit(self):
+        await self._session.commit()
+
+    async def enqueue(self, keys: list[str]):
+        await self._session.execute(
+            insert(EpisodeJob)
+            .values([{'key': key} for key in keys])
+            .on_conflict_do_nothing(index_elements=[EpisodeJob.key])
+        )
+
+    async def claim(self, limit: int, lease: timedelta):
+        """Забирает свободные задачи; другие воркеры пропускают их благодаря SKIP LOCKED."""
+        free_jobs = (
+            select(EpisodeJob.id)
+            .where(or_(EpisodeJob.locked_until.is_(None), EpisodeJob.locked_until < func.now()))
+            .order_by(EpisodeJob.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        res = await self._session.execute(
+            update(EpisodeJob)
+            .where(EpisodeJob.id.in_(free_jobs.scalar_subquery()))
+            .values(locked_until=func.now() + lease, attempts=EpisodeJob.attempts + 1)
+            .returning(EpisodeJob.id, EpisodeJob.key, EpisodeJob.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        return sorted(res.all(), key=lambda job: job.id)
+
+    async def extend_lease(self, job_ids: list[int], lease: timedelta) -> list[int]:
+        """Продлевает еще не истекшую аренду задач, возвращает id продленных."""
+        res = await self._session.execute(
+            update(EpisodeJob)
+            .where(EpisodeJob.id.in_(job_ids), EpisodeJob.locked_until > func.now())
+            .values(locked_until=func.now() + lease)
+            .returning(EpisodeJob.id)
+            .execution_options(synchronize_session=False)
+        )
+        return res.scalars().all()
+
+    async def ack(self, job_ids: list[int]):
+        # deliveries only guard against repeated notifications while the job can be redelivered
+        await self._session.execute(
+            delete(NotificationDelivery)
+            .where(NotificationDelivery.episode_key.in_(select(EpisodeJob.key).where(EpisodeJob.id.in_(job_ids))))
+        )
+        await self._session.execute(delete(EpisodeJob).where(EpisodeJob.id.in_(job_ids)))
+
+    async def retry_later(self, job_id: int, delay: timedelta):
+        await self._session.execute(
+            update(EpisodeJob)
+            .where(EpisodeJob.id == job_id)
+            .values(locked_until=func.now() + delay)
+        )
+
+    async def undelivered_users_ids(self, episode_key: str, users_ids: list[int]) -> list[int]:
+        res = await self._session.execute(
+            select(NotificationDelivery.user_id)
+            .where(NotificationDelivery.episode_key == episode_key)
+        )
+        delivered = set(res.scalars().all())
+        return [user_id for user_id in users_ids if user_id not in delivered]
+
+    async def mark_delivered(self, episode_key: str, users_ids: list[int]):
+        await self._session.execute(
+            insert(NotificationDelivery)
+            .values([{'episode_key': episode_key, 'user_id': user_id} for user_id in users_ids])
+            .on_conflict_do_nothing()
+        )
+
+
+class AnnouncementRepository:
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    async def commit(self):
+        await self._session.commit()
+
+    async def create(self, text: str, chat_id: int, total: int, lease: timedelta) -> Announcement:
+        """Рассылка сразу закреплена за создавшим ее экземпляром бота."""
+        res = await self._session.execute(
+            insert(Announcement)
+            .values(text=text, chat_id=chat_id, total=total, locked_until=func.now() + lease)
+            .returning(Announcement)
+        )
+        return res.scalar_one()
+
+    async def claim_unfinished(self, lease: timedelta) -> list[Announcement]:
+        """Забирает незавершенные рассылки, которые никто не отправляет: после перезапуска или падения."""
+        free = (
+            select(Announcement.id)
+            .where(
+                Announcement.finished_at.is_(None),
+                or_(Announcement.locked_until.is_(None), Announcement.locked_until < func.now()),
+            )
+            .with_for_update(skip_locked=True)
+        )
+        res = await self._session.execute(
+            update(Announcement)
+            .where(Announcement.id.in_(free.scalar_subquery()))
+            .values(locked_until=func.now() + lease)
+            .returning(Announcement)
+            .execution_options(synchronize_session=False)
+        )
+        return sorted(res.scalars().all(), key=lambda announcement: announcement.id)
+
+    async def save_progress(
+        self,
+        announcement_id: int,
+        last_user_id: int,
+        sent: int,
+        failed: int,
+        blocked: int,
+        lease: timedelta,
+    ):
+        # every checkpoint also prolongs the lease
+        await self._session.execute(
+            update(Announcement)
+            .where(Announcement.id == announcement_id)
+            .values(
+                last_user_id=last_user_id,
+                sent=sent,
+                failed=failed,
+                blocked=blocked,
+                locked_until=func.now() + lease,
+            )
+        )
+
+    async def set_progress_message(self, announcement_id: int, message_id: int):
+        await self._session.execute(
+            update(Announcement)
+            .where(Announcement.id == announcement_id)
+            .values(progress_message_id=message_id)
+        )
+
+    async def release(self, announcement_id: int):
+        await self._session.execute(
+            update(Announcement)
+            .where(Announcement.id == announcement_id)
+            .values(locked_until=None)
+        )
+
+    async def finish(self, announcement_id: int):
+        await self._session.execute(
+            update(Announcement)
+            .where(Announcement.id == announcement_id)
+            .values(finished_at=func.now(), locked_until=None)
+        )
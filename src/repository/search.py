@@ -0,0 +1,168 @@
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict, defaultdict
+from typing import Awaitable, Callable, Iterable
+
+from transliterate import translit
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize(text: str) -> str:
+    return _NON_WORD.sub(' ', text.lower().replace('ё', 'е')).strip()
+
+
+def trigrams(text: str) -> set[str]:
+    # every word is padded like in pg_trgm, so short words and word starts still match
+    result = set()
+    for word in text.split():
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class SeasonSearchIndex:
+    """
+    Поиск сезонов по названию в памяти процесса вместо ts_rank по всей таблице.
+
+    Индексируются только не вышедшие сезоны. Совпадение ищется по триграммам
+    (опечатки, порядок слов) и по префиксам слов (недописанный запрос), результаты
+    ранжируются и кэшируются по нормализованному запросу. Если ничего не нашлось,
+    запрос повторяется в транслитерации. Индекс перестраивается после изменения
+    сезонов или раз в `ttl` секунд: в отдельном потоке и не больше одной сборки
+    одновременно, готовый индекс подменяет старый целиком.
+    """
+
+    # share of query trigrams found in a title
+    MIN_COVERAGE = 0.5
+    PREFIX_BONUS = 0.5
+
+    def __init__(self, ttl: float = 300, cache_size: int = 512, limit: int = 20):
+        self._ttl = ttl
+        self._cache_size = cache_size
+        self._limit = limit
+        self._built_at: float | None = None
+        # bumped by invalidate(), so a build started before it doesn't count as fresh
+        self._version = 0
+        self._build_lock = asyncio.Lock()
+        # season id -> number of trigrams of all its titles
+        self._season_trigrams: dict[int, int] = {}
+        self._trigram_postings: dict[str, tuple[int, ...]] = {}
+        # first letter -> word -> season ids, so prefix lookup scans only words with the same letter
+        self._words: dict[str, dict[str, tuple[int, ...]]] = {}
+        self._results: OrderedDict[str, list[int]] = OrderedDict()
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self._ttl
+
+    def invalidate(self):
+        self._built_at = None
+        self._version += 1
+
+    async def refresh(self, load: Callable[[], Awaitable[Iterable[tuple[int, str, str]]]]):
+        """
+        Перестраивает устаревший индекс по сезонам из `load`, не блокируя event loop.
+        Одновременные поиски дожидаются одной общей сборки.
+        """
+        if not self.is_stale:
+            return
+        async with self._build_lock:
+            # the index may have been built while waiting for the lock
+            if not self.is_stale:
+                return
+            version = self._version
+            seasons = await load()
+            self._swap(*await asyncio.to_thread(self._build, seasons))
+            if self._version != version:
+                # seasons changed during the build, the next search rebuilds it again
+                self._built_at = None
+
+    def build(self, seasons: Iterable[tuple[int, str, str]]):
+        """Перестраивает индекс по (id, title_ru, title_en) не вышедших сезонов."""
+        self._swap(*self._build(seasons))
+
+    @staticmethod
+    def _build(seasons: Iterable[tuple[int, str, str]]) -> tuple[dict, dict, dict]:
+        season_trigrams = {}
+        trigram_postings = defaultdict(list)
+        words = defaultdict(lambda: defaultdict(list))
+
+        for season_id, *titles in seasons:
+            normalized = ' '.join(normalize(title) for title in titles if title)
+            season_trigram_set = trigrams(normalized)
+            season_trigrams[season_id] = len(season_trigram_set)
+            for trigram in season_trigram_set:
+                trigram_postings[trigram].append(season_id)
+            for word in set(normalized.split()):
+                words[word[0]][word].append(season_id)
+
+        # tuples of ints are not tracked by the garbage collector, unlike millions of sets,
+        # so collections and freeing the old index don't stall the event loop
+        return (
+            season_trigrams,
+            {trigram: tuple(ids) for trigram, ids in trigram_postings.items()},
+            {letter: {word: tuple(ids) for word, ids in letter_words.items()} for letter, letter_words in words.items()},
+        )
+
+    def _swap(self, season_trigrams: dict, trigram_postings: dict, words: dict):
+        # runs in the event loop thread, so searches never see a half-replaced index
+        self._season_trigrams = season_trigrams
+        self._trigram_postings = trigram_postings
+        self._words = words
+        self._results.clear()
+        self._built_at = time.monotonic()
+
+    def search(self, query: str) -> list[int]:
+        """Id сезонов по убыванию релевантности."""
+        normalized = normalize(query)
+        if not normalized:
+            return []
+
+        if normalized in self._results:
+            self._results.move_to_end(normalized)
+            return self._results[normalized]
+
+        found = self._rank(normalized)
+        if not found:
+            found = self._rank(normalize(translit(normalized, language_code='ru', reversed=True)))
+
+        self._results[normalized] = found
+        if len(self._results) > self._cache_size:
+            self._results.popitem(last=False)
+        return found
+
+    def _rank(self, query: str) -> list[int]:
+        query_trigrams = trigrams(query)
+        scores: dict[int, float] = defaultdict(float)
+
+        common: dict[int, int] = defaultdict(int)
+        for trigram in query_trigrams:
+            for season_id in self._trigram_postings.get(trigram, ()):
+                common[season_id] += 1
+        for season_id, count in common.items():
+            coverage = count / len(query_trigrams)
+            if coverage >= self.MIN_COVERAGE:
+                # among equally covered titles the closer by length goes first
+                similarity = count / (len(query_trigrams) + self._season_trigrams[season_id] - count)
+                scores[season_id] += coverage + similarity / 2
+
+        query_words = query.split()
+        for query_word in query_words:
+            matched = set()
+            for word, season_ids in self._words.get(query_word[0], {}).items():
+                if word.startswith(query_word):
+                    matched.update(season_ids)
+            for season_id in matched:
+                scores[season_id] += self.PREFIX_BONUS / len(query_words)
+
+        ranked = sorted(scores, key=lambda season_id: (-scores[season_id], season_id))
+        return ranked[:self._limit]
+
+
+season_search_index = SeasonSearchIndex(
+    ttl=float(os.getenv('CATALOG_CACHE_TTL', 300)),
+    cache_size=int(os.getenv('SEARCH_CACHE_SIZE', 512)),
+)
@@ -1,3 +1,6 @@
+import csv
+from datetime import timedelta
+
 import aiohttp
 from aiogram import F, Router
 from aiogram.enums import ParseMode
@@ -5,18 +8,26 @@ from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message
-from aiogram.utils.formatting import Bold, as_marked_section
+from aiogram.utils.formatting import Bold, as_list, as_marked_section
 from aiogram.utils.markdown import hide_link
 from dependency_injector.wiring import Provide, inject
 from sqlalchemy.exc import IntegrityError, NoResultFound, SQLAlchemyError
 
-from config import Container
-from repository.repository import AdminRepository
+from config import ADMINS_CACHE_TTL, BROADCAST_RATE, INACTIVE_USERS_REPORT_INTERVAL, Container
+from repository.cache import catalog_cache
+from repository.config import sessionmanager
+from repository.repository import AdminRepository, UsersRepository
 from routers.middleware import IsAdminMiddleware
-from tasks.scrapping_task.scrapper import URL
+from tasks.import_task.importer import import_catalog
+from tasks.notification_task.announcements import AnnouncementSender
+from tasks.notification_task.broadcaster import Broadcaster
+from tasks.notification_task.recipients import reclaimed_capacity_lines
+from tasks.scrapping_task.http_client import ScrapperHttpClient
+from tasks.scrapping_task.scheduling import AdaptiveScrapeScheduler
+from tasks.scrapping_task.sources import SourceRegistry
 
 router = Router()
-router.message.middleware(IsAdminMiddleware())
+router.message.middleware(IsAdminMiddleware(ttl=ADMINS_CACHE_TTL))
 
 
 @router.message(F.text.lower() == 'отмена')
@@ -37,9 +48,12 @@ async def list_commands_handler(message: Message):
         "/add_season - добавить новый сезон\n"
         "/add_dubbed_season - добавить озвучки для сезона\n"
         "/update_status - обновить статус сезона\n"
+        "/import - загрузить каталог из CSV/JSON файла (команда в подписи к файлу)\n"
         "/origins - список с первоисточниками\n"
         "/studios - список студий озвучки\n"
-        "/set_scrapper_url https://new-example.com/ - установить новое значение\n"
+        "/stats - метрики бота\n"
+        "/broadcast - отправить объявление всем пользователям\n"
+        "/set_scrapper_url [источник] https://new-example.com/ - установить новое значение\n"
         "отмена - для отмены текущей операции"
     )
 
@@ -263,6 +277,91 @@ async def create_dubbed_seasons(
     await state.clear()
 
 
+# BULK IMPORT COMMAND
+
+@router.message(Command('import'), F.document)
+@inject
+async def import_catalog_handler(
+    message: Message,
+    state: FSMContext,
+    admin_repo: AdminRepository = Provide[Container.admin_repository],
+):
+    """
+    Загружает каталог из документа, отправленного с командой в подписи.
+    Все добавляется одной транзакцией, в ответ приходит отчет по строкам.
+    """
+    await state.clear()
+
+    file = await message.bot.download(message.document)
+    try:
+        report = await import_catalog(file, message.document.file_name or '', admin_repo)
+    except (ValueError, csv.Error) as e:
+        await message.answer(**as_list('Не удалось прочитать файл:', str(e)).as_kwargs())
+        return
+    except SQLAlchemyError:
+        await message.answer('Ошибка базы данных, ничего не добавлено')
+        return
+
+    content = as_marked_section(Bold("Импорт завершен:"), *report.as_lines(), marker="▫️ ")
+    await message.answer(**content.as_kwargs())
+
+
+@router.message(Command('import'))
+async def import_catalog_help_handler(message: Message):
+    await message.answer(
+        "Отправьте CSV или JSON файл с командой /import в подписи.\n\n"
+        "Каждая строка - объект с полем type:\n"
+        "origin: title_ru, title_en\n"
+        "studio: name\n"
+        "season: origin, title_ru, title_en, status, cover\n"
+        "dubbed_season: season, studio\n\n"
+        "В CSV поля - колонки заголовка, JSON - массив объектов или объект на строку."
+    )
+
+
+# BROADCAST COMMAND FLOW
+
+class Broadcast(StatesGroup):
+    enter_text = State()
+    approve_result = State()
+
+
+@router.message(Command('broadcast'))
+async def broadcast_command(message: Message, state: FSMContext):
+    await state.clear()
+    await message.answer("Текст объявления? Форматирование сохранится")
+    await state.set_state(Broadcast.enter_text)
+
+
+@router.message(Broadcast.enter_text, F.text)
+async def broadcast_text_entered(message: Message, state: FSMContext):
+    await state.update_data(text=message.html_text)
+    # preview is exactly what users will get
+    await message.answer(message.html_text, parse_mode=ParseMode.HTML)
+    await message.answer("Отправляю всем пользователям? [Да, отмена]")
+    await state.set_state(Broadcast.approve_result)
+
+
+@router.message(Broadcast.approve_result, F.text.lower() == 'да')
+@inject
+async def approve_broadcast(
+    message: Message,
+    state: FSMContext,
+    announcement_sender: AnnouncementSender = Provide[Container.announcement_sender],
+):
+    """
+    Рассылка идет в фоне, прогресс приходит отдельным сообщением и обновляется.
+    """
+    data = await state.get_data()
+    await state.clear()
+    try:
+        announcement_id = await announcement_sender.create(data['text'], message.chat.id)
+    except SQLAlchemyError:
+        await message.answer('Ошибка базы данных, рассылка не запущена')
+        return
+    await message.answer(f'Рассылка #{announcement_id} запущена')
+
+
 class UpdateSeasonStatus(StatesGroup):
     enter_season_name = State()
     update_status = State()
@@ -293,6 +392,7 @@ async def update_season_status(
     data = await state.get_data()
     try:
         await admin_repo.update_season_status(season_name=data['season_name'], status=message.text.lower())
+        await admin_repo.commit()
         await message.answer("Обновлено")
     except SQLAlchemyError:
         await message.answer('Ошибка, проверьте данные')
@@ -330,22 +430,86 @@ async def get_all_studios_handler(
     await message.answer(**content.as_kwargs())
 
 
+@router.message(Command('stats'))
+@inject
+async def get_stats_handler(
+    message: Message,
+    state: FSMContext,
+    http_client: ScrapperHttpClient = Provide[Container.http_client],
+    scrape_scheduler: AdaptiveScrapeScheduler = Provide[Container.scrape_scheduler],
+    user_repo: UsersRepository = Provide[Container.user_repository],
+    broadcaster: Broadcaster = Provide[Container.broadcaster],
+):
+    await state.clear()
+
+    inactive_users = await reclaimed_capacity_lines(
+        user_repo,
+        period=timedelta(hours=INACTIVE_USERS_REPORT_INTERVAL),
+        rate=BROADCAST_RATE,
+    )
+    content = as_list(
+        as_marked_section(
+            Bold("Скраппер:"),
+            *scrape_scheduler.as_lines(),
+            *http_client.metrics.as_lines(),
+            marker="▫️ ",
+        ),
+        as_marked_section(
+            Bold("База данных:"),
+            *sessionmanager.as_lines(),
+            marker="▫️ ",
+        ),
+        as_marked_section(
+            Bold("Кэш каталога:"),
+            *catalog_cache.as_lines(),
+            marker="▫️ ",
+        ),
+        as_marked_section(
+            Bold("Задержка доставки:"),
+            *broadcaster.as_lines(),
+            marker="▫️ ",
+        ),
+        as_marked_section(
+            Bold("Неактивные пользователи:"),
+            *inactive_users,
+            marker="▫️ ",
+        ),
+        sep="\n\n",
+    )
+    await message.answer(**content.as_kwargs())
+
+
 @router.message(Command('set_scrapper_url'))
+@inject
 async def set_scrapper_url(
     message: Message,
+    command: CommandObject,
     state: FSMContext,
+    sources: SourceRegistry = Provide[Container.source_registry],
 ):
+    """
+    /set_scrapper_url [источник] URL, по умолчанию меняет ссылку animego
+    """
     await state.clear()
 
-    global URL
-    _, new_url = message.text.split()
+    args = (command.args or '').split()
+    if not args:
+        await message.answer('\n'.join(f'{s.name}: {s.url}' for s in sources))
+        return
+
+    *name, new_url = args
+    source = sources.get(name[0] if name else 'animego')
+    if source is None:
+        await message.answer('Ошибка, источники: ' + ', '.join(s.name for s in sources))
+        return
 
     if not new_url.startswith('https://'):
-        await message.answer(f'Ошибка, текущее значение: {URL}')
+        await message.answer(f'Ошибка, текущее значение: {source.url}')
         return
     async with aiohttp.ClientSession() as session:
         async with session.get(new_url) as response:
             if response.status != 200:
                 await message.answer(f'Не удается выполнить успешный запрос, {response.status=}')
-            URL = new_url
-            await message.answer(f'Ссылка успешно обновлена: {URL}')
+                return
+            source.url = new_url
+            await message.answer(f'Ссылка успешно обновлена: {source.url}')
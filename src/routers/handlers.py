@@ -1,10 +1,10 @@
 import logging
 
 from aiogram import F, Router
-from aiogram.filters import CommandStart
+from aiogram.filters import KICKED, MEMBER, ChatMemberUpdatedFilter, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import CallbackQuery, Message, URLInputFile
+from aiogram.types import CallbackQuery, ChatMemberUpdated, Message, URLInputFile
 from aiogram.utils.formatting import as_marked_section
 from aiogram.utils.keyboard import (
     InlineKeyboardBuilder,
@@ -44,6 +44,10 @@ async def command_start_handler(
         user_repo.add(message.chat.id)
         await user_repo.commit()
         logging.info('Добавлен новый пользователь!')
+    elif not user.is_active:
+        await user_repo.activate(message.chat.id)
+        await user_repo.commit()
+        logging.info('Пользователь снова активен')
 
     await message.answer(
         f"Привет, {message.from_user.full_name}!\n"
@@ -56,6 +60,29 @@ async def command_start_handler(
     )
 
 
+# BOT BLOCKED/UNBLOCKED BY USER
+
+@router.my_chat_member(ChatMemberUpdatedFilter(member_status_changed=KICKED))
+@inject
+async def bot_blocked_handler(
+    event: ChatMemberUpdated,
+    user_repo: UsersRepository = Provide[Container.user_repository],
+):
+    # no need to wait for a failed notification to stop sending
+    await user_repo.deactivate([event.chat.id])
+    await user_repo.commit()
+
+
+@router.my_chat_member(ChatMemberUpdatedFilter(member_status_changed=MEMBER))
+@inject
+async def bot_unblocked_handler(
+    event: ChatMemberUpdated,
+    user_repo: UsersRepository = Provide[Container.user_repository],
+):
+    await user_repo.activate(event.chat.id)
+    await user_repo.commit()
+
+
 # USER SUBSCRIPTIONS
 
 
@@ -68,12 +95,7 @@ async def user_subscription_handler(
 ) -> None:
     await state.clear()
 
-    user = await user_repository.get_user_by_id(message.chat.id)
-
-    if user:
-        subscriptions = user.animelist
-    else:
-        subscriptions = list()
+    subscriptions = await user_repository.get_subscriptions(message.chat.id)
 
     seasons = [
         f'[Выход самой первой] {sub.season_name}' if sub.studio_name == '#subscribe_on_first'
@@ -120,11 +142,7 @@ async def cancel_subscription_handler(
 ) -> None:
     await state.clear()
 
-    user = await user_repo.get_user_by_id(message.chat.id)
-    if user:
-        subscriptions = user.animelist
-    else:
-        subscriptions = list()
+    subscriptions = await user_repo.get_subscriptions(message.chat.id)
 
     buttons = create_subscribed_season_buttons(subscriptions)
     builder = InlineKeyboardBuilder(buttons)
@@ -140,27 +158,22 @@ async def cancel_subscription_handler(
 @inject
 async def unsubscribe_season_handler(
     callback: CallbackQuery,
-    anime_repo: AnimeRepository = Provide[Container.anime_repository],
     user_repo: UsersRepository = Provide[Container.user_repository],
 ) -> None:
-    user = await user_repo.get_user_by_id(callback.message.chat.id)
-
     if callback.data == '#unsubscribe_all':
-        user.unsubscribe_all()
+        await user_repo.unsubscribe_all(callback.message.chat.id)
+        buttons = []
     else:
-        season = await anime_repo.get_dubbed_season_by_id(int(callback.data))
-        user.unsubscribe(season)
+        await user_repo.unsubscribe(callback.message.chat.id, int(callback.data))
+        # the rest of subscriptions are already in the keyboard, no need to query them again
+        buttons = [
+            row for row in callback.message.reply_markup.inline_keyboard
+            if row[0].callback_data not in (callback.data, '#unsubscribe_all')
+        ]
+        if len(buttons) > 5:
+            buttons += [[InlineKeyboardButton(text='❌ Отписаться от всех', callback_data='#unsubscribe_all')]]
     await user_repo.commit()
 
-    # refresh user's subs
-    user = await user_repo.get_user_by_id(callback.message.chat.id)
-
-    if user:
-        subscriptions = user.animelist
-    else:
-        subscriptions = list()
-
-    buttons = create_subscribed_season_buttons(subscriptions)
     builder = InlineKeyboardBuilder(buttons)
 
     await callback.answer('Подписка отменена', show_alert=True)
@@ -239,11 +252,15 @@ async def any_message_handler(
     builder.adjust(2)
 
     if dubbed_seasons:
-        await callback.message.answer_photo(
-            photo=URLInputFile(season.cover),
+        message = await callback.message.answer_photo(
+            photo=season.cover_file_id or URLInputFile(season.cover),
             caption=season.title_ru,
             reply_markup=builder.as_markup(),
         )
+        if not season.cover_file_id:
+            # next time the cover is sent by file_id, without downloading and uploading it again
+            await anime_repo.save_cover_file_id(season.id, message.photo[-1].file_id)
+            await anime_repo.commit()
         await state.set_state(Subscribe.choosing_voiceover_studio)
     else:
         await callback.message.answer(
@@ -257,21 +274,18 @@ async def any_message_handler(
 async def add_subscribiton_handler(
     callback: CallbackQuery,
     user_repo: UsersRepository = Provide[Container.user_repository],
-    anime_repo: AnimeRepository = Provide[Container.anime_repository],
 ) -> None:
+    try:
+        subscribed = await user_repo.subscribe(callback.message.chat.id, int(callback.data))
+        await user_repo.commit()
+    except SQLAlchemyError:
+        await callback.answer('❌ Произошла ошибка, повторите попытку немного позже', show_alert=True)
+        return
 
-    season = await anime_repo.get_dubbed_season_by_id(int(callback.data))
-    user = await user_repo.get_user_by_id(callback.message.chat.id)
-
-    if user.is_subsribed(season):
-        await callback.answer('❗️ Вы уже подписаны', show_alert=True)
+    if subscribed:
+        await callback.answer('✅ Подписка оформлена', show_alert=True)
     else:
-        user.subscribe(season)
-        try:
-            await user_repo.commit()
-            await callback.answer('✅ Подписка оформлена', show_alert=True)
-        except SQLAlchemyError:
-            await callback.answer('❌ Произошла ошибка, повторите попытку немного позже', show_alert=True)
+        await callback.answer('❗️ Вы уже подписаны', show_alert=True)
 
 
 # should be last handler
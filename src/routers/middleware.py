@@ -1,21 +1,86 @@
+import asyncio
+import logging
+import time
 from typing import Any, Awaitable, Callable, Dict
 
 from aiogram import BaseMiddleware
 from aiogram.types import Message, TelegramObject
 
-from repository.config import get_session
+from repository.config import get_session, session_scope
 from repository.repository import UsersRepository
 
 
 class IsAdminMiddleware(BaseMiddleware):
+    """
+    Пропускает к обработчикам только админов. Множество id админов загружается
+    одним запросом и перечитывается раз в `ttl` секунд или после invalidate(),
+    так что обычные сообщения проверяются без обращения к базе.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self._ttl = ttl
+        self._admins_ids: frozenset[int] = frozenset()
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def _get_admins_ids(self) -> frozenset[int]:
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self._ttl:
+            return self._admins_ids
+
+        async with self._lock:
+            # may be already reloaded while waiting for the lock
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self._ttl:
+                async with get_session() as session:
+                    self._admins_ids = frozenset(await UsersRepository(session).get_admins_ids())
+                self._loaded_at = time.monotonic()
+        return self._admins_ids
+
     async def __call__(
             self,
             handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
             event: TelegramObject | Message,
             data: Dict[str, Any],
     ) -> Any:
-        async with get_session() as session:
-            user = await UsersRepository(session).get_user_by_id(event.chat.id)
-            if user.is_admin:
-                result = await handler(event, data)
-                return result
+        if event.chat.id in await self._get_admins_ids():
+            result = await handler(event, data)
+            return result
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Открывает отдельную сессию на каждый апдейт и закрывает ее после обработки.
+    Считает апдейты в обработке, чтобы при остановке дождаться их через drain().
+    """
+
+    def __init__(self):
+        self._handling = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        self._handling += 1
+        self._idle.clear()
+        try:
+            async with session_scope():
+                return await handler(event, data)
+        finally:
+            self._handling -= 1
+            if not self._handling:
+                self._idle.set()
+
+    async def drain(self, timeout: float):
+        """Дожидается обработчиков уже полученных апдейтов."""
+        # updates received right before the stop get a chance to enter the middleware
+        await asyncio.sleep(0)
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f'Не дождались обработки апдейтов до остановки: {self._handling}')
@@ -0,0 +1,182 @@
+import csv
+import io
+import itertools
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, TextIO
+
+from pydantic import ValidationError
+
+from repository.repository import AdminRepository
+from tasks.import_task.modelsDTO import (
+    DubbedSeasonRow,
+    OriginRow,
+    SeasonRow,
+    StudioRow,
+    catalog_row_adapter,
+)
+
+# errors shown to admin, telegram message is limited to 4096 characters
+MAX_REPORTED_ERRORS = 30
+# characters read at once from a JSON array
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ImportReport:
+    added: Counter = field(default_factory=Counter)
+    # (row number, reason)
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+    def add_error(self, row: int, reason: str):
+        self.errors.append((row, reason))
+
+    def as_lines(self) -> list[str]:
+        lines = [
+            f'Первоисточников добавлено: {self.added["origin"]}',
+            f'Студий добавлено: {self.added["studio"]}',
+            f'Сезонов добавлено/обновлено: {self.added["season"]}',
+            f'Озвучек добавлено: {self.added["dubbed_season"]}',
+        ]
+        if self.errors:
+            lines.append(f'Пропущено строк: {len(self.errors)}')
+            lines.extend(f'строка {row}: {reason}' for row, reason in sorted(self.errors)[:MAX_REPORTED_ERRORS])
+        return lines
+
+
+def read_rows(file: BinaryIO, filename: str) -> Iterator[tuple[int, dict]]:
+    """
+    Строки CSV (с заголовком) или JSON документа вместе с их номерами.
+    JSON может быть массивом объектов либо объектом на каждой строке (JSON Lines).
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+
+    if filename.lower().endswith('.csv'):
+        # first line is a header
+        for number, row in enumerate(csv.DictReader(text), start=2):
+            yield number, {key: value for key, value in row.items() if key and value}
+        return
+
+    # an array may be written on a single line, so only its first character is read here
+    head = ''
+    while char := text.read(1):
+        head += char
+        if not char.isspace():
+            break
+    if head.endswith('['):
+        yield from enumerate(_read_json_array(text, head), start=1)
+        return
+
+    # leading blank lines are kept, so the numbers match the lines of the file
+    first_lines = io.StringIO(head + text.readline(), newline='')
+    for number, line in enumerate(itertools.chain(first_lines, text), start=1):
+        if line.strip():
+            yield number, json.loads(line)
+
+
+def _read_json_array(text: TextIO, buffer: str) -> Iterator:
+    """Элементы JSON массива по одному, в памяти держится только текущий."""
+    decoder = json.JSONDecoder()
+    position = buffer.index('[') + 1
+    exhausted = False
+
+    while True:
+        # skip whitespace and separators between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+            # a number at the end of the buffer may continue in the next chunk
+            complete = end < len(buffer) or exhausted
+        except json.JSONDecodeError:
+            if exhausted:
+                raise
+            complete = False
+
+        if complete:
+            yield value
+            position = end
+            continue
+
+        chunk = text.read(JSON_CHUNK_SIZE)
+        exhausted = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+        if exhausted and not buffer.strip():
+            raise ValueError('JSON массив не закрыт')
+
+
+async def import_catalog(file: BinaryIO, filename: str, admin_repo: AdminRepository) -> ImportReport:
+    """
+    Загружает первоисточники, студии, сезоны и озвучки из документа одной транзакцией.
+    Невалидные строки и строки со ссылками на несуществующие записи пропускаются
+    и попадают в отчет, остальные добавляются пачками через INSERT ... ON CONFLICT.
+    """
+    report = ImportReport()
+    # keyed by natural keys, so duplicates in the document don't hit one row twice
+    origins: dict[tuple[str, str], OriginRow] = {}
+    studios: dict[str, StudioRow] = {}
+    seasons: dict[str, tuple[int, SeasonRow]] = {}
+    dubbed_seasons: dict[tuple[str, str], tuple[int, DubbedSeasonRow]] = {}
+
+    for number, raw in read_rows(file, filename):
+        try:
+            row = catalog_row_adapter.validate_python(raw)
+        except ValidationError as e:
+            error = e.errors()[0]
+            report.add_error(number, f'{".".join(map(str, error["loc"]))}: {error["msg"]}')
+            continue
+
+        if isinstance(row, OriginRow):
+            origins[(row.title_ru, row.title_en)] = row
+        elif isinstance(row, StudioRow):
+            studios[row.name] = row
+        elif isinstance(row, SeasonRow):
+            seasons[row.title_ru] = (number, row)
+        else:
+            dubbed_seasons[(row.season, row.studio)] = (number, row)
+
+    try:
+        report.added['origin'] = await admin_repo.bulk_add_origins(
+            [row.model_dump(exclude={'type'}) for row in origins.values()]
+        )
+        report.added['studio'] = await admin_repo.bulk_add_studios(list(studios))
+
+        origins_ids = await admin_repo.origins_ids_by_names({row.origin for _, row in seasons.values()})
+        new_seasons = []
+        for number, row in seasons.values():
+            if row.origin not in origins_ids:
+                report.add_error(number, f'первоисточник "{row.origin}" не найден')
+                continue
+            new_seasons.append({
+                'origin_id': origins_ids[row.origin],
+                **row.model_dump(exclude={'type', 'origin'}),
+            })
+        report.added['season'] = await admin_repo.bulk_upsert_seasons(new_seasons)
+
+        seasons_ids = await admin_repo.seasons_ids_by_names({row.season for _, row in dubbed_seasons.values()})
+        existing_studios = await admin_repo.existing_studios({row.studio for _, row in dubbed_seasons.values()})
+        new_dubbed_seasons = []
+        for number, row in dubbed_seasons.values():
+            if row.season not in seasons_ids:
+                report.add_error(number, f'сезон "{row.season}" не найден')
+            elif row.studio not in existing_studios:
+                report.add_error(number, f'студия "{row.studio}" не найдена')
+            else:
+                new_dubbed_seasons.append({
+                    'season_id': seasons_ids[row.season],
+                    'season_name': row.season,
+                    'studio_name': row.studio,
+                })
+        report.added['dubbed_season'] = await admin_repo.bulk_add_dubbed_seasons(new_dubbed_seasons)
+
+        await admin_repo.commit()
+    except Exception:
+        # nothing is saved if any of statements failed
+        await admin_repo.rollback()
+        raise
+    return report
@@ -0,0 +1,42 @@
+from typing import Annotated, Literal, Union
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+
+from repository.orm_models import SeasonStatus
+
+
+class CatalogRow(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, str_min_length=1)
+
+
+class OriginRow(CatalogRow):
+    type: Literal['origin']
+    title_ru: str
+    title_en: str
+
+
+class StudioRow(CatalogRow):
+    type: Literal['studio']
+    name: str
+
+
+class SeasonRow(CatalogRow):
+    type: Literal['season']
+    # title_ru of the origin
+    origin: str
+    title_ru: str
+    title_en: str
+    status: SeasonStatus = SeasonStatus.ONGOING
+    cover: str | None = None
+
+
+class DubbedSeasonRow(CatalogRow):
+    type: Literal['dubbed_season']
+    # title_ru of the season
+    season: str
+    studio: str
+
+
+catalog_row_adapter = TypeAdapter(
+    Annotated[Union[OriginRow, StudioRow, SeasonRow, DubbedSeasonRow], Field(discriminator='type')]
+)
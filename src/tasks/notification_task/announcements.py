@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.utils.formatting import Bold, as_marked_section
+
+from repository.config import get_session
+from repository.orm_models import Announcement
+from repository.repository import AnnouncementRepository, UsersRepository
+from tasks.notification_task.broadcaster import BroadcastStats, Broadcaster, Priority
+
+
+@dataclass
+class AnnouncementProgress:
+    announcement_id: int
+    text: str
+    chat_id: int
+    progress_message_id: int | None
+    total: int
+    last_user_id: int
+    sent: int
+    failed: int
+    blocked: int
+    finished: bool = False
+    # the rate is counted only for messages sent by this process
+    started: float = field(default_factory=time.monotonic)
+    processed_here: int = 0
+
+    @classmethod
+    def from_announcement(cls, announcement: Announcement) -> 'AnnouncementProgress':
+        return cls(
+            announcement_id=announcement.id,
+            text=announcement.text,
+            chat_id=announcement.chat_id,
+            progress_message_id=announcement.progress_message_id,
+            total=announcement.total,
+            last_user_id=announcement.last_user_id,
+            sent=announcement.sent,
+            failed=announcement.failed,
+            blocked=announcement.blocked,
+        )
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.processed_here / elapsed if elapsed else 0.0
+
+    def add_page(self, last_user_id: int, stats: BroadcastStats):
+        self.last_user_id = last_user_id
+        self.sent += stats.sent
+        self.failed += stats.failed
+        self.blocked += stats.blocked
+        self.processed_here += stats.sent + stats.failed + stats.blocked
+
+    def as_lines(self) -> list[str]:
+        # users who joined after the start are sent too, so processed may exceed total
+        return [
+            f'Обработано: {self.processed}/{max(self.total, self.processed)}',
+            f'Отправлено: {self.sent}',
+            f'Ошибок: {self.failed}',
+            f'Недоступны (бот заблокирован, аккаунт удален): {self.blocked}',
+            f'Скорость: {self.rate:.1f} msg/s',
+        ]
+
+
+class AnnouncementSender:
+    """
+    Рассылка объявлений администраторов всем пользователям.
+
+    Пользователи выбираются страницами по `page_size` в порядке users.id и
+    отправляются через общий Broadcaster, так что действуют те же лимиты Telegram.
+    После каждой страницы в базе сохраняется контрольная точка: после падения или
+    перезапуска рассылка продолжается с нее, повторно может прийти не больше одной
+    страницы. Пока рассылка идет, экземпляр бота продлевает `lease` на нее, и
+    другие экземпляры ее не забирают. Прогресс показывается в сообщении админу,
+    которое обновляется не чаще раза в `progress_interval` секунд.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        broadcaster: Broadcaster,
+        page_size: int = 500,
+        lease: float = 300,
+        progress_interval: float = 5,
+    ):
+        self._bot = bot
+        self._broadcaster = broadcaster
+        self._page_size = page_size
+        self._lease = timedelta(seconds=lease)
+        self._progress_interval = progress_interval
+        # announcement id -> task sending it
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    async def create(self, text: str, chat_id: int) -> int:
+        async with get_session() as session:
+            total = await UsersRepository(session).count_active()
+            repo = AnnouncementRepository(session)
+            announcement = await repo.create(text, chat_id, total, self._lease)
+            await repo.commit()
+
+        self.start(announcement)
+        return announcement.id
+
+    def start(self, announcement: Announcement):
+        progress = AnnouncementProgress.from_announcement(announcement)
+        task = asyncio.create_task(self._run(progress))
+        self._tasks[progress.announcement_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(progress.announcement_id, None))
+
+    async def resume(self):
+        """Подхватывает незавершенные рассылки, которые никто не отправляет."""
+        async with get_session() as session:
+            repo = AnnouncementRepository(session)
+            announcements = await repo.claim_unfinished(self._lease)
+            await repo.commit()
+
+        for announcement in announcements:
+            if announcement.id not in self._tasks:
+                logging.info(f'Рассылка #{announcement.id} продолжена с пользователя {announcement.last_user_id}')
+                self.start(announcement)
+
+    async def stop(self, timeout: float):
+        """Останавливает рассылки, они продолжатся с последней контрольной точки после перезапуска."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    async def _run(self, progress: AnnouncementProgress):
+        shown_at = 0.0
+        try:
+            if progress.progress_message_id is None:
+                await self._show(progress)
+                shown_at = time.monotonic()
+
+            while True:
+                async with get_session() as session:
+                    page = await UsersRepository(session).active_users_ids_after(progress.last_user_id, self._page_size)
+                if not page:
+                    break
+
+                stats = await self._broadcaster.broadcast(
+                    page,
+                    progress.text,
+                    priority=Priority.BULK,
+                    parse_mode=ParseMode.HTML,
+                )
+                progress.add_page(page[-1], stats)
+
+                async with get_session() as session:
+                    repo = AnnouncementRepository(session)
+                    await repo.save_progress(
+                        progress.announcement_id,
+                        last_user_id=progress.last_user_id,
+                        sent=progress.sent,
+                        failed=progress.failed,
+                        blocked=progress.blocked,
+                        lease=self._lease,
+                    )
+                    await repo.commit()
+
+                if time.monotonic() - shown_at >= self._progress_interval:
+                    await self._show(progress)
+                    shown_at = time.monotonic()
+
+            async with get_session() as session:
+                repo = AnnouncementRepository(session)
+                await repo.finish(progress.announcement_id)
+                await repo.commit()
+            progress.finished = True
+            await self._show(progress)
+            logging.info(f'Рассылка #{progress.announcement_id} завершена: {progress.as_lines()}')
+        except Exception as e:
+            logging.error(f'Рассылка #{progress.announcement_id} прервана: {e!r}')
+        finally:
+            if not progress.finished:
+                # don't wait for the lease to expire, the next resume() takes it at once
+                async with get_session() as session:
+                    repo = AnnouncementRepository(session)
+                    await repo.release(progress.announcement_id)
+                    await repo.commit()
+
+    async def _show(self, progress: AnnouncementProgress):
+        title = 'завершена' if progress.finished else 'идет'
+        content = as_marked_section(
+            Bold(f'Рассылка #{progress.announcement_id} {title}:'),
+            *progress.as_lines(),
+            marker='▫️ ',
+        )
+        try:
+            if progress.progress_message_id is None:
+                message = await self._bot.send_message(progress.chat_id, **content.as_kwargs())
+                progress.progress_message_id = message.message_id
+                async with get_session() as session:
+                    repo = AnnouncementRepository(session)
+                    await repo.set_progress_message(progress.announcement_id, message.message_id)
+                    await repo.commit()
+            else:
+                # "message is not modified" and deleted messages are not a reason to stop
+                with suppress(TelegramBadRequest):
+                    await self._bot.edit_message_text(
+                        chat_id=progress.chat_id,
+                        message_id=progress.progress_message_id,
+                        **content.as_kwargs(),
+                    )
+        except Exception as e:
+            logging.warning(f'Прогресс рассылки #{progress.announcement_id} не обновлен: {e!r}')
@@ -0,0 +1,313 @@
+import asyncio
+import bisect
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Awaitable, Callable, Iterable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+
+class TokenBucket:
+    """Классический token bucket: `rate` токенов в секунду, не больше `capacity` за раз."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self._rate = rate
+        self._capacity = capacity or rate
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    async def acquire(self):
+        # lock keeps waiters in FIFO order
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class Priority(IntEnum):
+    # subscribers of #subscribe_on_first wait for the first release of an episode
+    FIRST_DUB = 0
+    STUDIO = 1
+    # announcements and other mass messages
+    BULK = 2
+
+
+class WeightedTokenBucket(TokenBucket):
+    """
+    Token bucket, который делит токены между классами приоритета пропорционально
+    весам (smooth weighted round robin), пока токенов ждут несколько классов.
+    Если ждет один класс, ему достается вся скорость; внутри класса - FIFO.
+    """
+
+    def __init__(self, rate: float, weights: dict[Priority, float], capacity: float | None = None):
+        super().__init__(rate, capacity)
+        self._weights = weights
+        self._waiters: dict[Priority, deque[asyncio.Future]] = {priority: deque() for priority in Priority}
+        self._current = dict.fromkeys(Priority, 0.0)
+        self._dispatcher: asyncio.Task | None = None
+
+    async def acquire(self, priority: Priority = Priority.STUDIO):
+        self._refill()
+        if self._tokens >= 1 and not any(self._waiters.values()):
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while any(self._waiters.values()):
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                continue
+
+            future = self._waiters[self._pick()].popleft()
+            # waiter was cancelled, the token stays in the bucket
+            if not future.done():
+                future.set_result(None)
+                self._tokens -= 1
+
+    def _pick(self) -> Priority:
+        waiting = [priority for priority in Priority if self._waiters[priority]]
+        for priority in Priority:
+            if priority in waiting:
+                self._current[priority] += self._weights.get(priority, 1)
+            else:
+                self._current[priority] = 0.0
+        # on a tie the more important class goes first
+        chosen = max(waiting, key=lambda priority: (self._current[priority], -priority))
+        self._current[chosen] -= sum(self._weights.get(priority, 1) for priority in waiting)
+        return chosen
+
+
+class LatencyHistogram:
+    """Распределение задержек доставки по фиксированным корзинам, в секундах."""
+
+    BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 300)
+
+    def __init__(self):
+        # the last one counts everything above the largest bucket
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.total = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.total += 1
+
+    def percentile(self, p: float) -> float:
+        """Верхняя граница корзины, в которую попадает перцентиль."""
+        rank = self.total * p / 100
+        seen = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def as_line(self) -> str:
+        if not self.total:
+            return 'нет отправок'
+        buckets = ', '.join(
+            f'≤{bound}s: {count}' for bound, count in zip(self.BUCKETS, self.counts) if count
+        )
+        if self.counts[-1]:
+            buckets += f', >{self.BUCKETS[-1]}s: {self.counts[-1]}'
+        p50, p99 = (
+            f'≤ {bound}s' if bound != float('inf') else f'> {self.BUCKETS[-1]}s'
+            for bound in (self.percentile(50), self.percentile(99))
+        )
+        return f'{self.total} msg, p50 {p50}, p99 {p99} ({buckets})'
+
+
+@dataclass
+class BroadcastStats:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    # bot is blocked, the account is deleted or the chat doesn't exist, not counted as failed
+    blocked: int = 0
+    unreachable: list[int] = field(default_factory=list)
+    retried: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: float | None = None
+    # seconds between the start of broadcast and delivery of each message
+    latencies: list[float] = field(default_factory=list)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def __str__(self):
+        return (
+            f'{self.sent}/{self.total} sent, {self.failed} failed, {self.blocked} blocked, {self.retried} retried '
+            f'in {self.elapsed:.1f}s ({self.throughput:.1f} msg/s), '
+            f'latency p50={self.percentile(50):.2f}s p99={self.percentile(99):.2f}s'
+        )
+
+
+def is_unreachable(error: Exception) -> bool:
+    """Повторная отправка в этот чат не поможет: бот заблокирован, аккаунт удален или чата нет."""
+    # forbidden covers blocked bot, kicked bot and deactivated user
+    if isinstance(error, TelegramForbiddenError):
+        return True
+    return isinstance(error, TelegramBadRequest) and 'chat not found' in error.message.lower()
+
+
+class Broadcaster:
+    """
+    Рассылка одного сообщения множеству пользователей.
+
+    Сообщения отправляются пачками по `concurrency` штук, общий поток ограничен
+    token bucket'ом (лимит Telegram ~30 msg/s на бота), а в один чат пишем не чаще
+    `chat_interval` секунд. При TelegramRetryAfter все отправки ставятся на паузу.
+
+    Каждая рассылка идет со своим приоритетом: одновременные рассылки делят лимит
+    по `weights` классов, задержки доставки копятся в гистограмме своего класса.
+    Чаты, куда доставить уже нельзя (бот заблокирован, аккаунт удален, чат не найден),
+    передаются в `on_unreachable` после каждой пачки, чтобы больше на них не тратить лимит.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        rate: float = 30,
+        concurrency: int = 30,
+        chat_interval: float = 1.0,
+        max_retries: int = 3,
+        on_unreachable: Callable[[list[int]], Awaitable] | None = None,
+        weights: dict[Priority, float] | None = None,
+    ):
+        self._bot = bot
+        self._bucket = WeightedTokenBucket(
+            rate,
+            weights or {Priority.FIRST_DUB: 6, Priority.STUDIO: 3, Priority.BULK: 1},
+        )
+        self._concurrency = concurrency
+        self._chat_interval = chat_interval
+        self._max_retries = max_retries
+        self._on_unreachable = on_unreachable
+        self._chat_last_sent: dict[int, float] = {}
+        self._paused_until = 0.0
+        self.latency = {priority: LatencyHistogram() for priority in Priority}
+
+    def as_lines(self) -> list[str]:
+        names = {Priority.FIRST_DUB: 'Первая озвучка', Priority.STUDIO: 'Студии', Priority.BULK: 'Объявления'}
+        return [f'{names[priority]}: {self.latency[priority].as_line()}' for priority in Priority]
+
+    async def broadcast(
+        self,
+        chat_ids: Iterable[int],
+        text: str,
+        on_sent: Callable[[list[int]], Awaitable] | None = None,
+        photo: str | None = None,
+        priority: Priority = Priority.STUDIO,
+        **kwargs,
+    ) -> BroadcastStats:
+        """
+        `on_sent` вызывается после каждой пачки со списком чатов, куда сообщение доставлено.
+        Если передан `photo` (file_id), отправляется фото с `text` в подписи.
+        """
+        chat_ids = list(dict.fromkeys(chat_ids))
+        stats = BroadcastStats(total=len(chat_ids))
+
+        for i in range(0, len(chat_ids), self._concurrency):
+            batch = chat_ids[i:i + self._concurrency]
+            results = await asyncio.gather(
+                *(self._send(chat_id, text, stats, photo, priority, **kwargs) for chat_id in batch)
+            )
+
+            sent = [chat_id for chat_id, ok in zip(batch, results) if ok is True]
+            if on_sent and sent:
+                await on_sent(sent)
+
+            unreachable = [chat_id for chat_id, ok in zip(batch, results) if ok is None]
+            stats.unreachable.extend(unreachable)
+            if self._on_unreachable and unreachable:
+                await self._on_unreachable(unreachable)
+
+        stats.finished = time.monotonic()
+        return stats
+
+    async def _send(
+        self,
+        chat_id: int,
+        text: str,
+        stats: BroadcastStats,
+        photo: str | None = None,
+        priority: Priority = Priority.STUDIO,
+        **kwargs,
+    ) -> bool | None:
+        """True - доставлено, False - ошибка, None - чат недоступен навсегда."""
+        for _ in range(self._max_retries + 1):
+            await self._wait_for_slot(chat_id, priority)
+            try:
+                if photo:
+                    await self._bot.send_photo(chat_id, photo, caption=text, **kwargs)
+                else:
+                    await self._bot.send_message(chat_id, text, **kwargs)
+            except TelegramRetryAfter as e:
+                logging.warning(f'Flood control, пауза {e.retry_after}s')
+                stats.retried += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                continue
+            except Exception as e:
+                if is_unreachable(e):
+                    stats.blocked += 1
+                    return None
+                logging.error(f'{chat_id}: {e}')
+                stats.failed += 1
+                return False
+
+            stats.sent += 1
+            stats.latencies.append(time.monotonic() - stats.started)
+            self.latency[priority].observe(stats.latencies[-1])
+            return True
+
+        stats.failed += 1
+        return False
+
+    async def _wait_for_slot(self, chat_id: int, priority: Priority):
+        while (pause := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(pause)
+
+        chat_wait = self._chat_last_sent.get(chat_id, 0.0) + self._chat_interval - time.monotonic()
+        if chat_wait > 0:
+            await asyncio.sleep(chat_wait)
+
+        await self._bucket.acquire(priority)
+        self._chat_last_sent[chat_id] = time.monotonic()
+        self._forget_idle_chats()
+
+    def _forget_idle_chats(self):
+        if len(self._chat_last_sent) < 10_000:
+            return
+        threshold = time.monotonic() - self._chat_interval
+        self._chat_last_sent = {
+            chat_id: sent for chat_id, sent in self._chat_last_sent.items() if sent > threshold
+        }
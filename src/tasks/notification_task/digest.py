@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from aiogram.enums import ParseMode
+from sqlalchemy.exc import SQLAlchemyError
+
+from repository.config import get_session
+from repository.repository import NotificationQueueRepository
+from tasks.notification_task.broadcaster import Broadcaster, Priority
+
+DIGEST_HEADER = 'Вышли новые эпизоды:'
+# telegram message is limited to 4096 characters
+MAX_DIGEST_LINES = 40
+
+
+@dataclass(eq=False)
+class DigestItem:
+    """Уведомление об одном эпизоде для всех его получателей."""
+    episode_key: str
+    # full notification, sent when the user has nothing else in the window
+    text: str
+    photo: str | None
+    # line of the digest message
+    line: str
+    # called with False if sending to some of the users broke off
+    on_done: Callable[[bool], Awaitable] | None = None
+    # users whose message with this item is not sent yet
+    remaining: int = 0
+    ok: bool = True
+
+
+@dataclass
+class _PendingUser:
+    deadline: float
+    # the most important of the user's notifications
+    priority: Priority
+    items: list[DigestItem] = field(default_factory=list)
+
+
+class DigestAggregator:
+    """
+    Копит уведомления каждого пользователя `window` секунд с первого из них и
+    отправляет их одним сообщением-дайджестом. Одиночное уведомление уходит как
+    обычно, так что задержка первого уведомления не больше `window`.
+
+    Пользователи с одинаковым набором эпизодов получают один и тот же дайджест,
+    он рассылается через Broadcaster одним вызовом. Когда все сообщения с эпизодом
+    отправлены, вызывается `on_done` этого эпизода.
+    """
+
+    def __init__(self, broadcaster: Broadcaster, window: float = 0):
+        self._broadcaster = broadcaster
+        self._window = window
+        # insertion order is the order of deadlines, flushed users are removed
+        self._pending: OrderedDict[int, _PendingUser] = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self._flushing: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self._window > 0
+
+    def add(self, users_ids: list[int], item: DigestItem, priority: Priority = Priority.STUDIO):
+        """Один эпизод можно добавить несколько раз для разных пользователей и приоритетов."""
+        if not users_ids:
+            return
+
+        deadline = time.monotonic() + self._window
+        item.remaining += len(users_ids)
+        for user_id in users_ids:
+            if user_id not in self._pending:
+                self._pending[user_id] = _PendingUser(deadline, priority)
+            pending = self._pending[user_id]
+            pending.priority = min(pending.priority, priority)
+            pending.items.append(item)
+
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    async def close(self, timeout: float):
+        """Сразу отправляет все накопленное и дожидается отправки."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+
+        self._flush(list(self._pending))
+        if self._flushing:
+            await asyncio.wait(self._flushing, timeout=timeout)
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            due = [user_id for user_id, pending in self._pending.items() if pending.deadline <= now]
+            self._flush(due)
+
+            self._wakeup.clear()
+            if self._pending:
+                first = next(iter(self._pending.values()))
+                # new users come with later deadlines, so only the first one is waited for
+                await asyncio.sleep(first.deadline - time.monotonic())
+            else:
+                await self._wakeup.wait()
+
+    def _flush(self, users_ids: list[int]):
+        # users with the same set of episodes get the same message
+        groups: dict[tuple[Priority, tuple[DigestItem, ...]], list[int]] = defaultdict(list)
+        for user_id in users_ids:
+            pending = self._pending.pop(user_id)
+            groups[(pending.priority, tuple(pending.items))].append(user_id)
+
+        for (priority, items), chat_ids in groups.items():
+            task = asyncio.create_task(self._send(items, chat_ids, priority))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _send(self, items: tuple[DigestItem, ...], chat_ids: list[int], priority: Priority):
+        if len(items) == 1:
+            text, photo = items[0].text, items[0].photo
+        else:
+            lines = [DIGEST_HEADER, *(item.line for item in items[:MAX_DIGEST_LINES])]
+            if len(items) > MAX_DIGEST_LINES:
+                lines.append(f'и еще {len(items) - MAX_DIGEST_LINES}')
+            text, photo = '\n'.join(lines), None
+
+        async def mark_delivered(sent_ids: list[int]):
+            async with get_session() as session:
+                repo = NotificationQueueRepository(session)
+                for item in items:
+                    await repo.mark_delivered(item.episode_key, sent_ids)
+                await repo.commit()
+
+        try:
+            stats = await self._broadcaster.broadcast(
+                chat_ids,
+                text,
+                on_sent=mark_delivered,
+                photo=photo,
+                priority=priority,
+                parse_mode=ParseMode.HTML,
+            )
+            logging.info(f'Дайджест из {len(items)} эпизодов: {stats}')
+        except SQLAlchemyError as e:
+            logging.error(f'Дайджест не отправлен до конца: {e}')
+            for item in items:
+                item.ok = False
+
+        for item in items:
+            item.remaining -= len(chat_ids)
+            if item.remaining == 0 and item.on_done:
+                await item.on_done(item.ok)
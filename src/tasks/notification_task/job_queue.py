@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Iterable
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from repository.config import get_session
+from repository.repository import NotificationQueueRepository
+from tasks.scrapping_task.modelsDTO import AnimeEpisode
+
+
+@dataclass(frozen=True)
+class Job:
+    id: int
+    episode: AnimeEpisode
+    attempts: int
+
+
+class NotificationQueue:
+    """
+    Очередь найденных эпизодов на рассылку поверх таблицы episode_jobs.
+
+    Задача удаляется только после ack, поэтому эпизоды, не обработанные до перезапуска,
+    будут выданы заново (at-least-once). Повторная обработка не дублирует уведомления:
+    кому уже отправлено, хранится в notification_deliveries и удаляется вместе с задачей.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 20,
+        lease: float = 1800,
+        retry_delay: float = 60,
+        max_attempts: int = 5,
+        poll_interval: float = 30,
+    ):
+        # how many claimed jobs this process may hold at once
+        self._capacity = capacity
+        self._lease = timedelta(seconds=lease)
+        self._retry_delay = timedelta(seconds=retry_delay)
+        self._max_attempts = max_attempts
+        self._poll_interval = poll_interval
+        self._in_flight: set[int] = set()
+        self._wakeup = asyncio.Event()
+
+    async def put_many(self, episodes: Iterable[AnimeEpisode]):
+        keys = [repr(episode) for episode in episodes]
+        if not keys:
+            return
+
+        async with get_session() as session:
+            repo = NotificationQueueRepository(session)
+            await repo.enqueue(keys)
+            await repo.commit()
+        self._wakeup.set()
+
+    async def get_many(self) -> list[Job]:
+        """Ждет появления задач и забирает их пачкой, но не больше свободных мест."""
+        while True:
+            limit = self._capacity - len(self._in_flight)
+            if limit > 0:
+                try:
+                    jobs = await self._claim(limit)
+                except SQLAlchemyError as e:
+                    logging.error(f'Не удалось получить задачи на рассылку: {e}')
+                    jobs = []
+                if jobs:
+                    return jobs
+            await self._wait()
+
+    async def ack(self, jobs: list[Job]):
+        try:
+            async with get_session() as session:
+                repo = NotificationQueueRepository(session)
+                await repo.ack([job.id for job in jobs])
+                await repo.commit()
+        except SQLAlchemyError as e:
+            # job will be redelivered after lease expires
+            logging.error(f'Не удалось подтвердить задачи {jobs}: {e}')
+        finally:
+            self._done(jobs)
+
+    async def retry(self, job: Job):
+        if job.attempts >= self._max_attempts:
+            logging.error(f'Эпизод {job.episode} не обработан за {job.attempts} попыток, задача удалена')
+            await self.ack([job])
+            return
+
+        try:
+            async with get_session() as session:
+                repo = NotificationQueueRepository(session)
+                await repo.retry_later(job.id, self._retry_delay)
+                await repo.commit()
+        except SQLAlchemyError as e:
+            logging.error(f'Не удалось отложить задачу {job}: {e}')
+        finally:
+            self._done([job])
+
+    async def keep_leases(self):
+        """
+        Продлевает аренду задач, которые держит этот процесс: пока они ждут своего
+        воркера или рассылаются, другой экземпляр бота их не заберет.
+        """
+        while True:
+            await asyncio.sleep(self._lease.total_seconds() / 3)
+            if not self._in_flight:
+                continue
+
+            jobs_ids = list(self._in_flight)
+            try:
+                async with get_session() as session:
+                    repo = NotificationQueueRepository(session)
+                    extended = await repo.extend_lease(jobs_ids, self._lease)
+                    await repo.commit()
+            except Exception as e:
+                logging.error(f'Не удалось продлить аренду задач на рассылку: {e!r}')
+                continue
+
+            # acked meanwhile or already expired, in which case another instance may take them
+            if lost := (set(jobs_ids) - set(extended)) & self._in_flight:
+                logging.warning(f'Аренда задач {sorted(lost)} истекла, они могут быть выданы повторно')
+
+    async def _claim(self, limit: int) -> list[Job]:
+        jobs = []
+        broken_ids = []
+        async with get_session() as session:
+            repo = NotificationQueueRepository(session)
+            for row in await repo.claim(limit, self._lease):
+                # lease of a job still being processed here has expired, it's already in work
+                if row.id in self._in_flight:
+                    continue
+                try:
+                    jobs.append(Job(id=row.id, episode=AnimeEpisode.from_str(row.key), attempts=row.attempts))
+                except ValueError as e:
+                    logging.error(f'Задача {row.id} с ключом {row.key!r} не разобрана и удалена: {e!r}')
+                    broken_ids.append(row.id)
+            if broken_ids:
+                await repo.ack(broken_ids)
+            await repo.commit()
+
+        self._in_flight.update(job.id for job in jobs)
+        return jobs
+
+    def _done(self, jobs: list[Job]):
+        self._in_flight.difference_update(job.id for job in jobs)
+        self._wakeup.set()
+
+    async def _wait(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
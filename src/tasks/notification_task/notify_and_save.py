@@ -1,94 +1,332 @@
 import asyncio
 import logging
+import zlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable
 
 from aiogram.enums import ParseMode
 from aiogram.utils.markdown import hide_link
 from dependency_injector.wiring import Provide, inject
+from sqlalchemy import Row
 from sqlalchemy.exc import SQLAlchemyError
 
-from config import Container, bot
-from repository.orm_models import DubbedSeason, Season
-from repository.repository import AdminRepository, AnimeRepository, UsersRepository
+from config import Container
+from repository.config import session_scope
+from repository.orm_models import Season
+from repository.repository import AdminRepository, AnimeRepository, NotificationQueueRepository
+from tasks.notification_task.broadcaster import Broadcaster, Priority
+from tasks.notification_task.digest import DigestAggregator, DigestItem
+from tasks.notification_task.job_queue import Job, NotificationQueue
 from tasks.scrapping_task.modelsDTO import AnimeEpisode
 
+# pause after an unexpected error, so a persistent one doesn't spin the dispatcher
+DISPATCHER_ERROR_DELAY = 5
+
+
+@dataclass
+class NotificationWorkers:
+    dispatcher: asyncio.Task
+    workers: list[asyncio.Task]
+    # extends leases of claimed jobs until the workers are done with them
+    lease_keeper: asyncio.Task
+    shards: list[asyncio.Queue]
+    digest: DigestAggregator
+
+    async def drain(self, timeout: float):
+        """
+        Перестает забирать новые эпизоды из очереди и дожидается, пока воркеры обработают
+        уже полученные. Остальные задачи останутся в базе до следующего запуска.
+        """
+        self.dispatcher.cancel()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(shard.join() for shard in self.shards)), timeout)
+        except asyncio.TimeoutError:
+            logging.warning('Не все уведомления разосланы до остановки, остальные будут разосланы после перезапуска')
+        # notifications waiting for their digest are sent right away
+        await self.digest.close(timeout)
+
+        for task in [*self.workers, self.lease_keeper]:
+            task.cancel()
+        await asyncio.gather(self.dispatcher, *self.workers, self.lease_keeper, return_exceptions=True)
+
 
 @inject
-async def new_episode_worker(
-    queue: asyncio.Queue,
-    anime_repo: AnimeRepository = Provide[Container.anime_repository],
-):
+def start_notification_workers(
+    workers_count: int,
+    batch_size: int = 20,
+    queue: NotificationQueue = Provide[Container.notification_queue],
+    digest: DigestAggregator = Provide[Container.notification_digest],
+) -> NotificationWorkers:
+    """
+    Запускает пул из `workers_count` воркеров и распределитель эпизодов между ними.
+    Воркер забирает из своей очереди до `batch_size` эпизодов за раз.
+    """
+    shards = [asyncio.Queue() for _ in range(workers_count)]
+
+    return NotificationWorkers(
+        dispatcher=asyncio.create_task(episode_dispatcher(queue, shards)),
+        workers=[asyncio.create_task(new_episode_worker(queue, shard, batch_size)) for shard in shards],
+        lease_keeper=asyncio.create_task(queue.keep_leases()),
+        shards=shards,
+        digest=digest,
+    )
+
+
+async def episode_dispatcher(queue: NotificationQueue, shards: list[asyncio.Queue]):
+    """
+    Все эпизоды одного сезона попадают к одному и тому же воркеру и обрабатываются
+    по порядку: от этого зависит проверка "вышла ли серия в первой озвучке".
+    """
     while True:
-        new_episode: AnimeEpisode = await queue.get()
+        try:
+            for job in await queue.get_many():
+                shard = zlib.crc32(job.episode.title_ru.encode()) % len(shards)
+                await shards[shard].put(job)
+        except Exception as e:
+            # otherwise no notifications are sent until restart
+            logging.error(f'Ошибка распределителя эпизодов: {e!r}')
+            await asyncio.sleep(DISPATCHER_ERROR_DELAY)
 
-        season = await anime_repo.get_season_by_name(new_episode.title_ru)
-        if not season:
-            queue.task_done()
-            logging.warning(f'Нет сезона с именем {new_episode.title_ru}')
-            continue
+
+async def new_episode_worker(queue: NotificationQueue, shard: asyncio.Queue, batch_size: int):
+    while True:
+        # whatever is already waiting is taken along with the first job, up to batch_size
+        jobs: list[Job] = [await shard.get()]
+        while len(jobs) < batch_size and not shard.empty():
+            jobs.append(shard.get_nowait())
 
         try:
-            dubbed_season = await anime_repo.get_dubbed_season_by_season_and_studio_name(
-                season.title_ru,
-                new_episode.studio_name,
-            )
-            if dubbed_season:
-                await notify_users(season, new_episode, dubbed_season)
-                await add_new_episode(dubbed_season, new_episode)
+            # each batch gets its own session, so workers don't block each other
+            async with session_scope() as session:
+                await handle_new_episodes(
+                    jobs,
+                    queue,
+                    anime_repo=AnimeRepository(session),
+                    admin_repo=AdminRepository(session),
+                    queue_repo=NotificationQueueRepository(session),
+                )
+        except Exception as e:
+            logging.error(f'Эпизоды {[job.episode for job in jobs]} не обработаны: {e!r}')
+            # release the jobs, otherwise their leases are extended forever
+            for job in jobs:
+                await queue.retry(job)
+        finally:
+            for _ in jobs:
+                shard.task_done()
+
+
+@dataclass
+class NewEpisode:
+    job: Job
+    # row of resolve_new_episode: season data to render the notification
+    season: Row
+    first_dub_users_ids: list[int]
+    studio_users_ids: list[int]
+
+
+async def handle_new_episodes(
+    jobs: list[Job],
+    queue: NotificationQueue,
+    anime_repo: AnimeRepository,
+    admin_repo: AdminRepository,
+    queue_repo: NotificationQueueRepository,
+):
+    """
+    Сохраняет эпизоды пачки одной транзакцией, затем рассылает уведомления по
+    каждому. Если пачку сохранить не удалось, все ее задачи будут повторены.
+    """
+    try:
+        new_episodes = await save_new_episodes(jobs, anime_repo, admin_repo)
+    except SQLAlchemyError as e:
+        logging.error(f'Эпизоды {[job.episode for job in jobs]} не сохранены: {e}')
+        await admin_repo.rollback()
+        for job in jobs:
+            await queue.retry(job)
+        return
+
+    # unknown seasons and new dubbed seasons have nothing to notify about
+    to_notify = {id(new_episode.job) for new_episode in new_episodes}
+    if done_jobs := [job for job in jobs if id(job) not in to_notify]:
+        await queue.ack(done_jobs)
+
+    for new_episode in new_episodes:
+        async def done(ok: bool, job: Job = new_episode.job):
+            if ok:
+                await queue.ack([job])
             else:
-                await create_dubbed_season(season, new_episode)
+                await queue.retry(job)
+
+        try:
+            deferred = await notify_about_episode(new_episode, queue_repo, on_done=done)
         except SQLAlchemyError as e:
-            logging.error(new_episode, e)
+            logging.error(f'{new_episode.job.episode}: {e}')
+            await admin_repo.rollback()
+            await queue.retry(new_episode.job)
+        else:
+            # notifications in a digest acknowledge the job once the digest is sent
+            if not deferred:
+                await queue.ack([new_episode.job])
 
-        queue.task_done()
 
+async def save_new_episodes(
+    jobs: list[Job],
+    anime_repo: AnimeRepository,
+    admin_repo: AdminRepository,
+) -> list[NewEpisode]:
+    """
+    Новые эпизоды и сезоны с новой озвучкой сохраняются многострочными
+    INSERT ... ON CONFLICT DO NOTHING. Эпизоды, о которых нужно уведомить, по порядку.
+    """
+    new_episodes: list[NewEpisode] = []
+    episodes: dict[tuple[int, int], AnimeEpisode] = {}
+    dubbed_seasons: dict[tuple[int, str], dict] = {}
+    # (season, episode number) saved earlier in this batch, the database doesn't see them yet
+    released_in_batch: set[tuple[str, int]] = set()
 
-@inject
-async def create_dubbed_season(
-    season: Season,
-    episode: AnimeEpisode,
-    admin_repo: AdminRepository = Provide[Container.admin_repository],
-):
-    admin_repo.add_dubbed_season(season.id, episode.title_ru, episode.studio_name)
-    await admin_repo.commit()
+    for job in jobs:
+        episode = job.episode
+        resolved = await anime_repo.resolve_new_episode(
+            episode.title_ru,
+            episode.studio_name,
+            episode.episode_number,
+        )
+        if not resolved:
+            logging.warning(f'Нет сезона с именем {episode.title_ru}')
+            continue
+
+        if resolved.dubbed_season_id is None:
+            dubbed_seasons[(resolved.season_id, episode.studio_name)] = {
+                'season_id': resolved.season_id,
+                'season_name': episode.title_ru,
+                'studio_name': episode.studio_name,
+            }
+            continue
 
+        # all episodes of a season come to the same worker, so the batch knows about the earlier dub
+        is_first_dub = resolved.is_first_dub and (episode.title_ru, episode.episode_number) not in released_in_batch
+        released_in_batch.add((episode.title_ru, episode.episode_number))
 
-@inject
-async def add_new_episode(
-    dubbed_season: DubbedSeason,
-    episode: AnimeEpisode,
-    admin_repo: AdminRepository = Provide[Container.admin_repository],
-):
-    admin_repo.add_episode(episode_number=episode.episode_number, season_id=dubbed_season.id)
+        episodes[(resolved.dubbed_season_id, episode.episode_number)] = episode
+        new_episodes.append(NewEpisode(
+            job=job,
+            season=resolved,
+            first_dub_users_ids=resolved.first_dub_users_ids if is_first_dub else [],
+            studio_users_ids=resolved.studio_users_ids,
+        ))
+
+    # episode may be already saved when notification job is redelivered
+    added = await admin_repo.bulk_add_episodes([
+        {'season_id': season_id, 'episode_number': number} for season_id, number in episodes
+    ])
+    added_dubbed_seasons = await admin_repo.bulk_add_dubbed_seasons(list(dubbed_seasons.values()))
     await admin_repo.commit()
-    logging.info('Эпизод ({}) {} [{}] добавлен'.format(episode.episode_number, episode.title_ru, episode.studio_name))
+
+    for key in added:
+        episode = episodes[key]
+        logging.info('Эпизод ({}) {} [{}] добавлен'.format(episode.episode_number, episode.title_ru, episode.studio_name))
+    if added_dubbed_seasons:
+        logging.info(f'Добавлено сезонов с новой озвучкой: {added_dubbed_seasons}')
+    return new_episodes
+
+
+async def notify_about_episode(
+    new_episode: NewEpisode,
+    queue_repo: NotificationQueueRepository,
+    on_done: Callable[[bool], Awaitable] | None = None,
+) -> bool:
+    """True, если уведомления отложены в дайджест и `on_done` будет вызван после их отправки."""
+    # the job may be redelivered after restart, skip users who already got notification
+    episode_key = repr(new_episode.job.episode)
+    undelivered = set(await queue_repo.undelivered_users_ids(
+        episode_key,
+        [*new_episode.first_dub_users_ids, *new_episode.studio_users_ids],
+    ))
+    first_dub_users_ids = [user_id for user_id in new_episode.first_dub_users_ids if user_id in undelivered]
+    first_dub = set(first_dub_users_ids)
+    recipients = {
+        Priority.FIRST_DUB: first_dub_users_ids,
+        # subscribers of both get the notification once, with the higher priority
+        Priority.STUDIO: [
+            user_id for user_id in new_episode.studio_users_ids
+            if user_id in undelivered and user_id not in first_dub
+        ],
+    }
+
+    # both priority classes are sent at once and share the session
+    session_lock = asyncio.Lock()
+
+    async def mark_delivered(sent_ids: list[int]):
+        async with session_lock:
+            await queue_repo.mark_delivered(episode_key, sent_ids)
+            await queue_repo.commit()
+
+    return await notify_users(
+        new_episode.season,
+        new_episode.job.episode,
+        recipients,
+        on_sent=mark_delivered,
+        on_done=on_done,
+    )
+
+
+def render_notification(season: Season, new_episode: AnimeEpisode) -> tuple[str, str | None]:
+    """Текст уведомления и file_id обложки, если она уже загружалась в Telegram."""
+    text = (
+        f'Вышел новый эпизод аниме:\n'
+        f'<b>{season.title_ru}</b>\n'
+        f'<b>Эпизод:</b> {new_episode.episode_number}\n'
+        f'<b>Озвучка:</b> {new_episode.studio_name}!'
+    )
+    if season.cover_file_id:
+        return text, season.cover_file_id
+    # telegram builds link preview itself, the bot doesn't download the cover
+    return f'{text}\n{hide_link(season.cover)}' if season.cover else text, None
+
+
+def render_digest_line(season: Season, new_episode: AnimeEpisode) -> str:
+    return f'<b>{season.title_ru}</b>, эпизод {new_episode.episode_number} ({new_episode.studio_name})'
 
 
 @inject
 async def notify_users(
     season: Season,
     new_episode: AnimeEpisode,
-    dubbed_season: DubbedSeason,
-    anime_repo: AnimeRepository = Provide[Container.anime_repository],
-    user_repo: UsersRepository = Provide[Container.user_repository],
-):
-    users_ids = await user_repo.subscribed_on_season_users_ids(dubbed_season)
+    recipients: dict[Priority, list[int]],
+    on_sent: Callable[[list[int]], Awaitable] | None = None,
+    on_done: Callable[[bool], Awaitable] | None = None,
+    broadcaster: Broadcaster = Provide[Container.broadcaster],
+    digest: DigestAggregator = Provide[Container.notification_digest],
+) -> bool:
+    """
+    `recipients` - id пользователей по классам приоритета, классы рассылаются
+    одновременно и делят лимит отправки по весам.
+    Если включены дайджесты и передан `on_done`, уведомления только ставятся в
+    дайджест и функция возвращает True, иначе рассылает их сразу.
+    """
+    # rendered once for all subscribers
+    text, photo = render_notification(season, new_episode)
+    if digest.enabled and on_done and any(recipients.values()):
+        item = DigestItem(
+            episode_key=repr(new_episode),
+            text=text,
+            photo=photo,
+            line=render_digest_line(season, new_episode),
+            on_done=on_done,
+        )
+        for priority, users_ids in recipients.items():
+            digest.add(users_ids, item, priority)
+        return True
 
-    # check if it first studio dubbed this episode; if so, add users subsribed for it
-    if not await anime_repo.check_if_new_episodes_exist(season.title_ru, new_episode.episode_number):
-        new = await user_repo.subscribed_on_first_dubb_users_ids(season.title_ru)
-        users_ids.extend(new)
+    async def send(priority: Priority, users_ids: list[int]):
+        stats = await broadcaster.broadcast(
+            users_ids,
+            text,
+            on_sent=on_sent,
+            photo=photo,
+            priority=priority,
+            parse_mode=ParseMode.HTML
+        )
+        logging.info(f'Уведомления о {new_episode} ({priority.name}): {stats}')
 
-    for user_id in set(users_ids):
-        try:
-            await bot.send_message(
-                user_id,
-                f'Вышел новый эпизод аниме:\n'
-                f'<b>{season.title_ru}</b>\n'
-                f'<b>Эпизод:</b> {new_episode.episode_number}\n'
-                f'<b>Озвучка:</b> {new_episode.studio_name}!\n'
-                f'{hide_link(season.cover)}',
-                parse_mode=ParseMode.HTML
-            )
-        except Exception as e:
-            logging.error(e)
-            continue
+    await asyncio.gather(*(send(priority, users_ids) for priority, users_ids in recipients.items() if users_ids))
+    return False
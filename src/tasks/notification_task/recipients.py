@@ -0,0 +1,50 @@
+import logging
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from aiogram.utils.formatting import Bold, as_marked_section
+
+from repository.config import get_session
+from repository.repository import UsersRepository
+
+
+async def deactivate_unreachable(users_ids: list[int]):
+    """
+    Выключает пользователей, которым сообщения больше не доставить. Они пропадают
+    из всех рассылок, пока снова не нажмут /start или не разблокируют бота.
+    """
+    async with get_session() as session:
+        user_repo = UsersRepository(session)
+        deactivated = await user_repo.deactivate(users_ids)
+        await user_repo.commit()
+    if deactivated:
+        logging.info(f'Выключено недоступных пользователей: {deactivated}')
+
+
+async def reclaimed_capacity_lines(user_repo: UsersRepository, period: timedelta, rate: float) -> list[str]:
+    report = await user_repo.inactive_users_report(datetime.now() - period)
+    return [
+        f'Неактивных пользователей: {report.inactive} (+{report.deactivated} за {_hours(period)})',
+        f'Их подписок: {report.subscriptions}',
+        f'Не отправлено уведомлений за {_hours(period)}: {report.skipped} '
+        f'(~{report.skipped / rate:.0f}s лимита рассылки)',
+    ]
+
+
+async def report_reclaimed_capacity(bot: Bot, period: timedelta, rate: float):
+    """Отчет админам о том, сколько отправок сэкономлено на неактивных пользователях."""
+    async with get_session() as session:
+        user_repo = UsersRepository(session)
+        lines = await reclaimed_capacity_lines(user_repo, period, rate)
+        admins_ids = await user_repo.get_admins_ids()
+
+    content = as_marked_section(Bold('Неактивные пользователи:'), *lines, marker='▫️ ')
+    for admin_id in admins_ids:
+        try:
+            await bot.send_message(admin_id, **content.as_kwargs())
+        except Exception as e:
+            logging.error(f'{admin_id}: {e}')
+
+
+def _hours(period: timedelta) -> str:
+    return f'{period.total_seconds() / 3600:.0f}ч'
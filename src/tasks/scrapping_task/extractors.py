@@ -0,0 +1,141 @@
+import re
+from abc import ABC, abstractmethod
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import Tag
+
+
+def retrieve_data_from_last_update_item(item: Tag):
+    return parse_last_update_item(
+        item.find('span', class_='last-update-title').text,
+        item.find('div', class_='text-truncate').text,
+        item.find('div', class_='text-gray-dark-6').text,
+    )
+
+
+def parse_last_update_item(title: str, episode: str, studio: str):
+    episode_number, _ = episode.split(' ')
+
+    return {
+        'title_ru': title,
+        'episode_number': int(episode_number),
+        'studio_name': studio.strip('()')
+    }
+
+
+class LastUpdateExtractor(ABC):
+    """Достает список последних обновлений из html страницы источника."""
+
+    @abstractmethod
+    def extract(self, content: str) -> list[dict]:
+        ...
+
+
+class SoupExtractor(LastUpdateExtractor):
+    """
+    BeautifulSoup с любым установленным парсером ('html.parser', 'lxml').
+    Дерево строится только для контейнера с последними обновлениями.
+    """
+
+    def __init__(self, features: str = 'html.parser'):
+        self._features = features
+
+    def extract(self, content: str) -> list[dict]:
+        soup = BeautifulSoup(
+            content,
+            features=self._features,
+            # while parsing, class is a raw string like 'last-update-container scroll'
+            parse_only=SoupStrainer('div', class_=re.compile(r'\blast-update-container\b')),
+        )
+        container = soup.find('div', class_='last-update-container')
+        if container is None:
+            return []
+
+        last_updated_blocks: list[Tag] = container.find_all('div', class_='media-body')
+        return [retrieve_data_from_last_update_item(block) for block in last_updated_blocks]
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _LastUpdateParser(HTMLParser):
+    # (tag, css class) of the fields inside .media-body block
+    FIELDS = {
+        ('span', 'last-update-title'): 'title',
+        ('div', 'text-truncate'): 'episode',
+        ('div', 'text-gray-dark-6'): 'studio',
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.items: list[dict[str, str]] = []
+        # only div and span are tracked, the rest of tags doesn't matter here
+        self._depth = {'div': 0, 'span': 0}
+        self._container_depth: int | None = None
+        self._item_depth: int | None = None
+        self._item: dict[str, str] | None = None
+        self._field: tuple[str, str, int] | None = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in self._depth:
+            return
+        self._depth[tag] += 1
+        classes = (dict(attrs).get('class') or '').split()
+
+        if self._container_depth is None:
+            if tag == 'div' and 'last-update-container' in classes:
+                self._container_depth = self._depth['div']
+            return
+
+        if self._item is None:
+            if tag == 'div' and 'media-body' in classes:
+                self._item = {}
+                self._item_depth = self._depth['div']
+            return
+
+        if self._field is None:
+            for (field_tag, field_class), name in self.FIELDS.items():
+                if tag == field_tag and field_class in classes and name not in self._item:
+                    self._item[name] = ''
+                    self._field = (name, tag, self._depth[tag])
+                    break
+
+    def handle_endtag(self, tag):
+        if tag not in self._depth:
+            return
+
+        if self._field and self._field[1] == tag and self._field[2] == self._depth[tag]:
+            self._field = None
+        if tag == 'div' and self._item is not None and self._depth['div'] == self._item_depth:
+            self.items.append(self._item)
+            self._item = None
+        if tag == 'div' and self._depth['div'] == self._container_depth:
+            # nothing interesting after the container, don't parse the rest of the page
+            raise _StopParsing
+
+        self._depth[tag] -= 1
+
+    def handle_data(self, data):
+        if self._field:
+            self._item[self._field[0]] += data
+
+
+class StreamingExtractor(LastUpdateExtractor):
+    """
+    Потоковый разбор стандартным HTMLParser без построения дерева.
+    Останавливается сразу после закрытия контейнера с последними обновлениями.
+    """
+
+    def extract(self, content: str) -> list[dict]:
+        parser = _LastUpdateParser()
+        try:
+            parser.feed(content)
+        except _StopParsing:
+            pass
+
+        return [
+            parse_last_update_item(item['title'], item['episode'], item['studio'])
+            for item in parser.items
+        ]
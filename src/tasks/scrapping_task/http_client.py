@@ -0,0 +1,93 @@
+import time
+from dataclasses import dataclass
+
+import aiohttp
+
+try:
+    import brotli  # noqa: F401 aiohttp decodes br responses only if brotli is installed
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+
+@dataclass
+class FetchMetrics:
+    requests: int = 0
+    not_modified: int = 0
+    bytes_downloaded: int = 0
+    total_time: float = 0.0
+    last_time: float = 0.0
+
+    def record(self, elapsed: float, size: int = 0, not_modified: bool = False):
+        self.requests += 1
+        self.not_modified += not_modified
+        self.bytes_downloaded += size
+        self.total_time += elapsed
+        self.last_time = elapsed
+
+    def as_lines(self) -> list[str]:
+        avg = self.total_time / self.requests if self.requests else 0.0
+        return [
+            f'Запросов: {self.requests} (без изменений: {self.not_modified})',
+            f'Скачано: {self.bytes_downloaded / 1024:.1f} KB',
+            f'Время запроса: последнее {self.last_time:.2f}s, среднее {avg:.2f}s',
+        ]
+
+
+class ScrapperHttpClient:
+    """
+    Долгоживущая http сессия скраппера: соединения переиспользуются между запусками,
+    а ETag/Last-Modified позволяют не скачивать страницу, если она не изменилась.
+    """
+
+    def __init__(self, timeout: float = 30, connections: int = 10):
+        self._timeout = timeout
+        self._connections = connections
+        self._session: aiohttp.ClientSession | None = None
+        # url -> conditional request headers
+        self._validators: dict[str, dict[str, str]] = {}
+        self.metrics = FetchMetrics()
+
+    async def start(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self._connections, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=self._timeout),
+            headers={'Accept-Encoding': ACCEPT_ENCODING},
+        )
+
+    async def close(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    def forget(self, url: str):
+        """Следующий запрос скачает страницу целиком, даже если она не изменилась."""
+        self._validators.pop(url, None)
+
+    async def fetch(self, url: str) -> str | None:
+        """Текст страницы или None, если она не изменилась с прошлого запроса; на 4xx/5xx - ClientResponseError."""
+        if self._session is None:
+            await self.start()
+
+        started = time.monotonic()
+        async with self._session.get(url, headers=self._validators.get(url, {})) as resp:
+            if resp.status == 304:
+                self.metrics.record(time.monotonic() - started, not_modified=True)
+                return None
+
+            body = await resp.read()
+            # Content-Length is the size on the wire, body is already decompressed
+            self.metrics.record(time.monotonic() - started, int(resp.headers.get('Content-Length', len(body))))
+
+            # 4xx/5xx must not be mistaken for "not modified"
+            if resp.status != 200:
+                resp.raise_for_status()
+
+            validators = {}
+            if etag := resp.headers.get('ETag'):
+                validators['If-None-Match'] = etag
+            if last_modified := resp.headers.get('Last-Modified'):
+                validators['If-Modified-Since'] = last_modified
+            self._validators[url] = validators
+
+            return body.decode(resp.get_encoding())
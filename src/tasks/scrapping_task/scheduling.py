@@ -0,0 +1,111 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from apscheduler.job import Job
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from sqlalchemy.exc import SQLAlchemyError
+
+from repository.config import get_session
+from repository.repository import AnimeRepository
+
+
+class AdaptiveScrapeScheduler:
+    """
+    Подбирает интервал запуска скраппера вместо фиксированных 5 минут.
+
+    По таблице episodes строится гистограмма выхода серий по (день недели, час).
+    В "горячие" часы источники опрашиваются каждые `hot_interval` секунд, в остальное
+    время - раз в `base_interval`. Если новых серий нет или источники недоступны,
+    интервал растет экспоненциально (не больше `base_interval` в горячие часы
+    и `max_interval` при ошибках или в остальное время).
+    """
+
+    # unchanged runs in a row before interval is doubled
+    IDLE_RUNS_PER_STEP = 4
+    HISTOGRAM_DAYS = 28
+    HISTOGRAM_TTL = 3600
+
+    def __init__(
+        self,
+        hot_interval: float = 30,
+        base_interval: float = 300,
+        max_interval: float = 1800,
+        hot_min_episodes: int = 2,
+    ):
+        self._hot_interval = hot_interval
+        self._base_interval = base_interval
+        self._max_interval = max_interval
+        self._hot_min_episodes = hot_min_episodes
+
+        self._histogram: dict[tuple[int, int], int] = {}
+        self._histogram_loaded = 0.0
+        self._idle_runs = 0
+        self._failed_runs = 0
+        self._job: Job | None = None
+        self._scrapper: Callable[[], Awaitable] | None = None
+        self.interval = base_interval
+
+    def start(self, scheduler: AsyncIOScheduler, scrapper: Callable[[], Awaitable]):
+        self._scrapper = scrapper
+        self._job = scheduler.add_job(self._run, 'interval', seconds=self.interval)
+
+    @property
+    def is_hot(self) -> bool:
+        now = datetime.now()
+        return self._histogram.get((now.isoweekday(), now.hour), 0) >= self._hot_threshold()
+
+    def _hot_threshold(self) -> float:
+        # hour is hot when it has more releases than an average hour with releases
+        if not self._histogram:
+            return float('inf')
+        average = sum(self._histogram.values()) / len(self._histogram)
+        return max(self._hot_min_episodes, average)
+
+    async def _run(self):
+        if time.monotonic() - self._histogram_loaded > self.HISTOGRAM_TTL:
+            await self._load_histogram()
+
+        try:
+            result = await self._scrapper()
+            failed = result.failed_sources > 0 and not result.new_episodes
+            found_new = result.new_episodes > 0
+        except Exception as e:
+            logging.error(f'Ошибка скраппера: {e!r}')
+            failed, found_new = True, False
+
+        self._failed_runs = self._failed_runs + 1 if failed else 0
+        self._idle_runs = 0 if found_new else self._idle_runs + 1
+
+        interval = self._next_interval()
+        if interval != self.interval:
+            self.interval = interval
+            self._job.reschedule('interval', seconds=interval)
+
+    def _next_interval(self) -> float:
+        if self._failed_runs:
+            return min(self._max_interval, self._base_interval * 2 ** (self._failed_runs - 1))
+
+        base, limit = self._base_interval, self._max_interval
+        if self.is_hot:
+            base, limit = self._hot_interval, self._base_interval
+        return min(limit, base * 2 ** (self._idle_runs // self.IDLE_RUNS_PER_STEP))
+
+    async def _load_histogram(self):
+        try:
+            async with get_session() as session:
+                self._histogram = await AnimeRepository(session).episodes_release_histogram(
+                    datetime.now() - timedelta(days=self.HISTOGRAM_DAYS)
+                )
+        except SQLAlchemyError as e:
+            logging.error(f'Не удалось загрузить статистику выхода серий: {e}')
+        self._histogram_loaded = time.monotonic()
+
+    def as_lines(self) -> list[str]:
+        # release time is uniform within the interval, so on average it's found in a half of it
+        return [
+            f'Интервал опроса: {self.interval:.0f}s ({"горячий час" if self.is_hot else "обычный час"})',
+            f'Ожидаемая задержка обнаружения: ~{self.interval / 2:.0f}s (макс. {self.interval:.0f}s)',
+            f'Запусков без новых серий: {self._idle_runs}, с ошибками: {self._failed_runs}',
+        ]
@@ -1,52 +1,78 @@
+import asyncio
 import logging
-from asyncio import Queue
+from typing import NamedTuple
 
-from bs4 import BeautifulSoup
-from bs4.element import Tag
+import aiohttp
+from dependency_injector.wiring import Provide, inject
 
+from config import Container
+from tasks.notification_task.job_queue import NotificationQueue
+from tasks.scrapping_task.http_client import ScrapperHttpClient
 from tasks.scrapping_task.modelsDTO import AnimeEpisode
-from tasks.scrapping_task.utils import (
-    get_html_from_website,
-    get_saved_episode_list,
-    retrieve_data_from_last_update_item,
-    update_storage_list,
-)
+from tasks.scrapping_task.sources import Source, SourceRegistry
+from tasks.scrapping_task.storage import SeenEpisodesStorage
+from tasks.scrapping_task.utils import notify_admins_about_source_error
 
-URL = 'https://animego.org/'
 
+class ScrapeResult(NamedTuple):
+    new_episodes: int = 0
+    failed_sources: int = 0
 
-async def scrapper(queue: Queue):
-    content = await get_html_from_website(URL)
 
-    if not content:
-        return
+@inject
+async def scrapper(
+    queue: NotificationQueue = Provide[Container.notification_queue],
+    storage: SeenEpisodesStorage = Provide[Container.seen_episodes_storage],
+    sources: SourceRegistry = Provide[Container.source_registry],
+    http_client: ScrapperHttpClient = Provide[Container.http_client],
+) -> ScrapeResult:
+    sources = list(sources)
 
-    soup = BeautifulSoup(content, features="html.parser")
+    # all sources are polled concurrently, so a slow mirror doesn't delay the others
+    results = await asyncio.gather(*(fetch_source(source, http_client) for source in sources))
+    failed_sources = results.count(None)
+    current_episode_list: set[AnimeEpisode] = set().union(*filter(None, results))
 
-    # get episode list with recently updated anime
-    last_updated_blocks: list[Tag] = (
-        soup
-        .find('div', class_='last-update-container')
-        .find_all('div', class_='media-body')
-    )
+    # pages haven't changed since last time or requests failed
+    if not current_episode_list:
+        return ScrapeResult(failed_sources=failed_sources)
 
-    current_episode_list = set()
+    try:
+        new_episodes = await save_new_episodes(current_episode_list, queue, storage)
+        return ScrapeResult(new_episodes, failed_sources)
+    except Exception:
+        # otherwise the pages would be skipped as not modified on the next run
+        for source in sources:
+            http_client.forget(source.url)
+        raise
 
-    for block in last_updated_blocks:
-        info = retrieve_data_from_last_update_item(block)
-        new_episode = AnimeEpisode.model_validate(info)
-        current_episode_list.add(new_episode)
 
-    # get saved scrapped data from last time
-    saved_episode_list = get_saved_episode_list()
+async def fetch_source(source: Source, http_client: ScrapperHttpClient) -> set[AnimeEpisode] | None:
+    """Эпизоды источника или None, если его не удалось опросить."""
+    try:
+        return set(await asyncio.wait_for(source.fetch_episodes(http_client), source.timeout))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error(f'{source.name}: {e!r}')
+        await notify_admins_about_source_error(source.url, e)
+    except Exception as e:
+        # e.g. page layout has changed
+        logging.error(f'{source.name}: не удалось разобрать {source.url}: {e!r}')
+        http_client.forget(source.url)
+    return None
 
-    # check whether new scrapped data differ from saved data
-    new_series: set[AnimeEpisode] = current_episode_list.difference(saved_episode_list)
+
+async def save_new_episodes(
+    current_episode_list: set[AnimeEpisode],
+    queue: NotificationQueue,
+    storage: SeenEpisodesStorage,
+) -> int:
+    new_series: set[AnimeEpisode] = await storage.unseen(current_episode_list)
 
     if new_series:
         # добавить новые эпизоды в очередь на рассылку уведомлений
-        [await queue.put(episode) for episode in new_series]
-
-        # сохранить новые эпизоды в локальный файл
-        update_storage_list(current_episode_list)
+        await queue.put_many(new_series)
+        # marked as seen only after they are enqueued: if the process dies in between,
+        # the next run enqueues them again and the queue ignores already queued keys
+        await storage.add_new(new_series)
         logging.info(f'Найдены новые серии: {new_series}')
+    return len(new_series)
@@ -0,0 +1,48 @@
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+from tasks.scrapping_task.extractors import LastUpdateExtractor
+from tasks.scrapping_task.http_client import ScrapperHttpClient
+from tasks.scrapping_task.modelsDTO import AnimeEpisode
+
+
+class Source(ABC):
+    """Сайт, с которого скраппер узнает о новых эпизодах."""
+
+    name: str
+
+    def __init__(self, url: str, timeout: float = 30):
+        self.url = url
+        self.timeout = timeout
+
+    @abstractmethod
+    async def fetch_episodes(self, client: ScrapperHttpClient) -> list[AnimeEpisode]:
+        """Последние вышедшие эпизоды; пустой список, если страница не изменилась."""
+
+
+class AnimegoSource(Source):
+    name = 'animego'
+
+    def __init__(self, url: str, extractor: LastUpdateExtractor, timeout: float = 30):
+        super().__init__(url, timeout)
+        self._extractor = extractor
+
+    async def fetch_episodes(self, client: ScrapperHttpClient) -> list[AnimeEpisode]:
+        content = await client.fetch(self.url)
+        if not content:
+            return []
+        return [AnimeEpisode.model_validate(info) for info in self._extractor.extract(content)]
+
+
+class SourceRegistry:
+    def __init__(self, sources: list[Source]):
+        self._sources = {source.name: source for source in sources}
+
+    def register(self, source: Source):
+        self._sources[source.name] = source
+
+    def get(self, name: str) -> Source | None:
+        return self._sources.get(name)
+
+    def __iter__(self) -> Iterator[Source]:
+        return iter(list(self._sources.values()))
@@ -0,0 +1,97 @@
+import asyncio
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable
+
+from repository.config import get_session
+from repository.repository import ScrapperRepository
+from tasks.scrapping_task.modelsDTO import AnimeEpisode
+
+
+class SeenEpisodesStorage(ABC):
+    """Хранилище эпизодов, которые скраппер уже видел."""
+
+    async def unseen(self, episodes: Iterable[AnimeEpisode]) -> set[AnimeEpisode]:
+        """Эпизоды, которых еще нет в хранилище, без их сохранения."""
+        episodes = {repr(episode): episode for episode in episodes}
+        if not episodes:
+            return set()
+
+        unseen_keys = await self._unseen_keys(list(episodes))
+        return {episodes[key] for key in unseen_keys}
+
+    async def add_new(self, episodes: Iterable[AnimeEpisode]) -> set[AnimeEpisode]:
+        """Сохраняет эпизоды и возвращает только те, которых раньше не было."""
+        episodes = {repr(episode): episode for episode in episodes}
+        if not episodes:
+            return set()
+
+        new_keys = await self._add_keys(list(episodes))
+        return {episodes[key] for key in new_keys}
+
+    @abstractmethod
+    async def _unseen_keys(self, keys: list[str]) -> list[str]:
+        ...
+
+    @abstractmethod
+    async def _add_keys(self, keys: list[str]) -> list[str]:
+        ...
+
+
+class PostgresSeenEpisodesStorage(SeenEpisodesStorage):
+    """Таблица seen_episodes, новые ключи отдает INSERT ... ON CONFLICT DO NOTHING RETURNING."""
+
+    async def _unseen_keys(self, keys: list[str]) -> list[str]:
+        async with get_session() as session:
+            return await ScrapperRepository(session).unseen_episodes(keys)
+
+    async def _add_keys(self, keys: list[str]) -> list[str]:
+        async with get_session() as session:
+            repo = ScrapperRepository(session)
+            new_keys = await repo.add_seen_episodes(keys)
+            await repo.commit()
+        return new_keys
+
+
+class SQLiteSeenEpisodesStorage(SeenEpisodesStorage):
+    """Локальный файл SQLite для запуска без общей базы."""
+
+    def __init__(self, path: str | Path):
+        self._path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = asyncio.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS seen_episodes '
+                '(key TEXT PRIMARY KEY, seen_at TEXT DEFAULT CURRENT_TIMESTAMP)'
+            )
+        return self._conn
+
+    def _insert_keys(self, keys: list[str]) -> list[str]:
+        conn = self._connect()
+        new_keys = []
+        with conn:
+            for key in keys:
+                # rowcount is 0 when the key is already stored
+                if conn.execute('INSERT OR IGNORE INTO seen_episodes (key) VALUES (?)', (key,)).rowcount:
+                    new_keys.append(key)
+        return new_keys
+
+    def _select_unseen(self, keys: list[str]) -> list[str]:
+        conn = self._connect()
+        placeholders = ', '.join('?' * len(keys))
+        seen = {row[0] for row in conn.execute(f'SELECT key FROM seen_episodes WHERE key IN ({placeholders})', keys)}
+        return [key for key in keys if key not in seen]
+
+    async def _unseen_keys(self, keys: list[str]) -> list[str]:
+        async with self._lock:
+            return await asyncio.to_thread(self._select_unseen, keys)
+
+    async def _add_keys(self, keys: list[str]) -> list[str]:
+        async with self._lock:
+            return await asyncio.to_thread(self._insert_keys, keys)
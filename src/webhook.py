@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import signal
+from contextlib import suppress
+from typing import Any, Dict
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Отвечает Telegram сразу и обрабатывает апдейт в фоне, но не больше `concurrency`
+    апдейтов одновременно: следующий запрос ждет свободного места, и Telegram
+    притормаживает отправку вместо того, чтобы копить задачи в памяти.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, concurrency: int, secret_token: str):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        task.add_done_callback(lambda _: self._semaphore.release())
+
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        try:
+            await super()._background_feed_update(bot, update)
+        except Exception as e:
+            logging.error(f'Ошибка обработки апдейта: {e!r}')
+
+    async def drain(self, timeout: float):
+        """Дожидается обработки уже принятых апдейтов."""
+        if self._background_feed_update_tasks:
+            await asyncio.wait(self._background_feed_update_tasks, timeout=timeout)
+
+
+async def run_webhook(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    url: str,
+    path: str,
+    host: str,
+    port: int,
+    concurrency: int,
+    secret_token: str,
+    shutdown_timeout: float = 30,
+):
+    """
+    Принимает апдейты на http сервере вместо long polling до SIGINT/SIGTERM.
+    При остановке новые запросы больше не принимаются, а начатые обработчики дорабатывают.
+    """
+    handler = BoundedRequestHandler(dispatcher, bot, concurrency, secret_token=secret_token)
+    app = web.Application()
+    app.router.add_post(path, handler.handle)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+
+    await dispatcher.emit_startup(bot=bot, dispatcher=dispatcher)
+    await bot.set_webhook(
+        url.rstrip('/') + path,
+        secret_token=secret_token,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+        # telegram doesn't allow more than 100 connections
+        max_connections=min(concurrency, 100),
+    )
+    logging.info(f'Webhook запущен на {host}:{port}{path}')
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # signals handling is not supported on Windows
+    with suppress(NotImplementedError):
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        # webhook is kept: other instances may still serve it
+        await site.stop()
+        await handler.drain(shutdown_timeout)
+        await runner.cleanup()
+        await dispatcher.emit_shutdown(bot=bot, dispatcher=dispatcher)
+        logging.info('Webhook остановлен')
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the bot runs from src/ and imports its modules as top-level packages
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
@@ -0,0 +1,63 @@
+import asyncio
+from collections import Counter
+
+from tasks.notification_task.broadcaster import Priority, WeightedTokenBucket
+
+
+async def grant_order(bucket: WeightedTokenBucket, waiters: dict[Priority, int]) -> list[Priority]:
+    order = []
+
+    async def acquire(priority: Priority):
+        await bucket.acquire(priority)
+        order.append(priority)
+
+    # the bucket starts full, take the token so that everyone has to wait
+    await bucket.acquire()
+    await asyncio.gather(*(
+        acquire(priority)
+        for priority, count in waiters.items()
+        for _ in range(count)
+    ))
+    return order
+
+
+def test_tokens_are_shared_by_weights():
+    bucket = WeightedTokenBucket(rate=1000, capacity=1, weights={Priority.FIRST_DUB: 3, Priority.STUDIO: 1})
+    order = asyncio.run(grant_order(bucket, {Priority.STUDIO: 40, Priority.FIRST_DUB: 40}))
+
+    assert Counter(order[:20]) == {Priority.FIRST_DUB: 15, Priority.STUDIO: 5}
+    # once first dub waiters are served, studio gets the whole rate
+    assert order[-20:] == [Priority.STUDIO] * 20
+
+
+def test_single_class_is_served_in_order():
+    bucket = WeightedTokenBucket(rate=1000, capacity=1, weights={})
+    order = []
+
+    async def acquire(n: int):
+        await bucket.acquire(Priority.BULK)
+        order.append(n)
+
+    async def main():
+        await bucket.acquire()
+        await asyncio.gather(*(acquire(n) for n in range(10)))
+
+    asyncio.run(main())
+    assert order == list(range(10))
+
+
+def test_cancelled_waiter_keeps_the_token():
+    bucket = WeightedTokenBucket(rate=20, capacity=1, weights={})
+
+    async def main():
+        await bucket.acquire()
+        cancelled = asyncio.create_task(bucket.acquire(Priority.STUDIO))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        # the next waiter gets the token after one refill, not two
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await bucket.acquire(Priority.STUDIO)
+        return loop.time() - started
+
+    assert asyncio.run(main()) < 0.09
@@ -0,0 +1,42 @@
+import time
+
+from repository.cache import TTLCache
+
+
+def test_get_and_counters():
+    cache = TTLCache(maxsize=2, ttl=60)
+    assert cache.get('a') is None
+
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # 'a' becomes the most recently used
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_entries_expire():
+    cache = TTLCache(ttl=0.05)
+    cache.set('a', 1)
+    time.sleep(0.1)
+
+    assert cache.get('a') is None
+    assert cache.as_lines()[0] == 'Записей: 0/1024'
+
+
+def test_clear():
+    cache = TTLCache()
+    cache.set(('season', 1), 'season')
+    cache.clear()
+
+    assert cache.get(('season', 1)) is None
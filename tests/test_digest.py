@@ -0,0 +1,98 @@
+import asyncio
+
+from sqlalchemy.exc import OperationalError
+
+from tasks.notification_task.broadcaster import BroadcastStats, Priority
+from tasks.notification_task.digest import DIGEST_HEADER, DigestAggregator, DigestItem
+
+
+class FakeBroadcaster:
+    def __init__(self, error: Exception | None = None):
+        self.sent: list[tuple[list[int], str, str | None, Priority]] = []
+        self._error = error
+
+    async def broadcast(self, chat_ids, text, on_sent=None, photo=None, priority=Priority.STUDIO, **kwargs):
+        if self._error:
+            raise self._error
+        self.sent.append((sorted(chat_ids), text, photo, priority))
+        return BroadcastStats()
+
+
+def item(n: int, done: list) -> DigestItem:
+    async def on_done(ok: bool):
+        done.append((n, ok))
+
+    return DigestItem(
+        episode_key=f'key{n}',
+        text=f'full {n}',
+        photo=f'photo{n}',
+        line=f'line {n}',
+        on_done=on_done,
+    )
+
+
+def test_episodes_of_a_window_are_sent_as_one_digest():
+    broadcaster = FakeBroadcaster()
+    done = []
+
+    async def main():
+        digest = DigestAggregator(broadcaster, window=0.05)
+        digest.add([1, 2], item(1, done))
+        digest.add([1, 2], item(2, done), priority=Priority.FIRST_DUB)
+        digest.add([3], item(3, done))
+        await asyncio.sleep(0.15)
+
+    asyncio.run(main())
+    assert sorted(broadcaster.sent) == [
+        ([1, 2], '\n'.join([DIGEST_HEADER, 'line 1', 'line 2']), None, Priority.FIRST_DUB),
+        # a single episode keeps the full notification with the cover
+        ([3], 'full 3', 'photo3', Priority.STUDIO),
+    ]
+    assert sorted(done) == [(1, True), (2, True), (3, True)]
+
+
+def test_on_done_waits_for_every_recipient():
+    broadcaster = FakeBroadcaster()
+    done = []
+
+    async def main():
+        digest = DigestAggregator(broadcaster, window=0.05)
+        shared = item(1, done)
+        digest.add([1], shared)
+        await asyncio.sleep(0.03)
+        digest.add([2], shared)
+        await asyncio.sleep(0.04)
+        # user 1 got it, user 2 is still in the window
+        assert done == []
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert len(broadcaster.sent) == 2
+    assert done == [(1, True)]
+
+
+def test_close_flushes_before_the_window_ends():
+    broadcaster = FakeBroadcaster()
+    done = []
+
+    async def main():
+        digest = DigestAggregator(broadcaster, window=60)
+        digest.add([1], item(1, done))
+        await digest.close(timeout=1)
+
+    asyncio.run(main())
+    assert broadcaster.sent == [([1], 'full 1', 'photo1', Priority.STUDIO)]
+    assert done == [(1, True)]
+
+
+def test_failed_send_is_reported():
+    broadcaster = FakeBroadcaster(OperationalError('mark_delivered', {}, Exception('db is down')))
+    done = []
+
+    async def main():
+        digest = DigestAggregator(broadcaster, window=60)
+        digest.add([1], item(1, done))
+        await digest.close(timeout=1)
+
+    asyncio.run(main())
+    assert done == [(1, False)]
@@ -0,0 +1,45 @@
+from importlib.util import find_spec
+from pathlib import Path
+
+import pytest
+
+from tasks.scrapping_task.extractors import SoupExtractor, StreamingExtractor
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+BACKENDS = [
+    pytest.param(StreamingExtractor, id='stream'),
+    pytest.param(SoupExtractor, id='soup'),
+    pytest.param(
+        lambda: SoupExtractor(features='lxml'),
+        id='lxml',
+        marks=pytest.mark.skipif(find_spec('lxml') is None, reason='lxml is not installed'),
+    ),
+]
+
+
+@pytest.fixture
+def page() -> str:
+    return (FIXTURES / 'animego_last_update.html').read_text(encoding='utf-8')
+
+
+@pytest.fixture(params=BACKENDS)
+def extractor(request):
+    return request.param()
+
+
+def test_extracts_last_updates(extractor, page):
+    items = extractor.extract(page)
+
+    assert len(items) == 40
+    assert items[0] == {'title_ru': 'Магическая битва', 'episode_number': 166, 'studio_name': 'JAM CLUB'}
+    # entities are decoded, blocks after the container are not taken
+    assert {'title_ru': 'Токийский гуль & Ко', 'episode_number': 1076, 'studio_name': 'SHIZA Project'} in items
+
+
+def test_backends_return_the_same_items(page):
+    assert StreamingExtractor().extract(page) == SoupExtractor().extract(page)
+
+
+def test_page_without_container(extractor):
+    assert extractor.extract('<html><body><div class="media-body">1 серия</div></body></html>') == []
@@ -0,0 +1,59 @@
+import io
+import json
+
+import pytest
+
+from tasks.import_task import importer
+from tasks.import_task.importer import read_rows
+
+ROWS = [
+    {'type': 'origin', 'title_ru': 'Магическая битва', 'title_en': 'Jujutsu Kaisen'},
+    {'type': 'studio', 'name': 'AniLibria'},
+    {'type': 'season', 'origin': 'Магическая битва', 'title_ru': 'Магическая битва 2', 'title_en': 'Jujutsu Kaisen 2',
+     'status': 'ongoing', 'cover': None},
+    {'type': 'dubbed_season', 'season': 'Магическая битва 2', 'studio': 'AniLibria [1, 2]'},
+]
+
+
+def rows(content: str, filename: str) -> list[tuple[int, dict]]:
+    return list(read_rows(io.BytesIO(content.encode('utf-8-sig')), filename))
+
+
+def test_csv_skips_empty_cells():
+    content = 'type,name,title_ru\r\nstudio,AniLibria,\r\norigin,,Ван-Пис\r\n'
+    assert rows(content, 'catalog.CSV') == [
+        (2, {'type': 'studio', 'name': 'AniLibria'}),
+        (3, {'type': 'origin', 'title_ru': 'Ван-Пис'}),
+    ]
+
+
+def test_json_lines():
+    content = '\n' + '\n'.join(json.dumps(row, ensure_ascii=False) for row in ROWS[:2]) + '\n\n'
+    assert rows(content, 'catalog.jsonl') == [(2, ROWS[0]), (3, ROWS[1])]
+    assert rows(' \n\n', 'catalog.json') == []
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_json_array(monkeypatch, chunk_size):
+    monkeypatch.setattr(importer, 'JSON_CHUNK_SIZE', chunk_size)
+    content = json.dumps(ROWS + [12345], ensure_ascii=False, indent=2)
+
+    assert rows(content, 'catalog.json') == list(enumerate(ROWS + [12345], start=1))
+    assert rows(' [ ] ', 'catalog.json') == []
+
+
+def test_json_array_is_read_lazily():
+    content = json.dumps([{'type': 'studio', 'name': f'studio {n}'} for n in range(50_000)])
+    file = io.BytesIO(content.encode())
+
+    reader = read_rows(file, 'catalog.json')
+    number, first = next(reader)
+
+    assert (number, first) == (1, {'type': 'studio', 'name': 'studio 0'})
+    assert file.tell() < len(content) // 10
+
+
+@pytest.mark.parametrize('content', ['[{"type": "studio"}', '[{"type": "studio"} {"type"', '['])
+def test_broken_json_array(content):
+    with pytest.raises(ValueError):
+        rows(content, 'catalog.json')
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from repository.search import SeasonSearchIndex, normalize
+
+SEASONS = [
+    (1, 'Магическая битва', 'Jujutsu Kaisen'),
+    (2, 'Поднятие уровня в одиночку', 'Solo Leveling'),
+    (3, 'Ванпанчмен', 'One Punch Man'),
+    (4, 'Ёрмунганд', 'Jormungand'),
+]
+
+
+def test_normalize():
+    assert normalize('  Ёрмунганд: Perfect Order! ') == 'ермунганд perfect order'
+
+
+def test_search_by_typo_prefix_and_translit():
+    index = SeasonSearchIndex()
+    index.build(SEASONS)
+
+    assert index.search('магическая битва')[0] == 1
+    assert index.search('магичская бтва')[0] == 1
+    assert index.search('подня')[0] == 2
+    assert index.search('ермунганд')[0] == 4
+    assert index.search('solo leveling')[0] == 2
+    # english title typed in cyrillic
+    assert index.search('соло левелинг') == [2]
+    assert index.search('совсем другое') == []
+
+
+def test_results_are_cached_until_rebuild():
+    index = SeasonSearchIndex()
+    index.build(SEASONS)
+    assert index.search('битва') == [1]
+
+    index.build([(5, 'Битва богов', None)])
+    assert index.search('битва') == [5]
+
+
+def test_stale_after_invalidate_and_ttl():
+    index = SeasonSearchIndex(ttl=0.05)
+    assert index.is_stale
+    index.build(SEASONS)
+    assert not index.is_stale
+
+    index.invalidate()
+    assert index.is_stale
+
+    index.build(SEASONS)
+    time.sleep(0.1)
+    assert index.is_stale
+
+
+def test_concurrent_refreshes_build_once():
+    index = SeasonSearchIndex()
+    loads = 0
+
+    async def load():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return SEASONS
+
+    async def main():
+        await asyncio.gather(*(index.refresh(load) for _ in range(10)))
+
+    asyncio.run(main())
+    assert loads == 1
+    assert index.search('битва') == [1]
+
+
+def test_refresh_runs_outside_the_event_loop():
+    index = SeasonSearchIndex()
+    seasons = [(i, f'Сезон {i}', f'Season {i}') for i in range(20_000)]
+    ticks = 0
+
+    async def load():
+        return seasons
+
+    async def ticker(stop: asyncio.Event):
+        nonlocal ticks
+        while not stop.is_set():
+            ticks += 1
+            await asyncio.sleep(0)
+
+    async def main():
+        stop = asyncio.Event()
+        task = asyncio.create_task(ticker(stop))
+        await index.refresh(load)
+        stop.set()
+        await task
+
+    asyncio.run(main())
+    # the loop kept running other tasks while the index was built
+    assert ticks > 1
+    assert not index.is_stale
+
+
+def test_invalidate_during_refresh_keeps_index_stale():
+    index = SeasonSearchIndex()
+
+    async def load():
+        # seasons change after they were read but before the index is swapped in
+        index.invalidate()
+        return SEASONS
+
+    asyncio.run(index.refresh(load))
+    assert index.is_stale
+    assert index.search('битва') == [1]